@@ -1,15 +1,37 @@
-from flask import Flask, render_template, request, jsonify
-import matplotlib.pyplot as plt
-import io
+from flask import Flask, Response, g, render_template, request, jsonify, send_file
 import base64
-import json
-import pickle
-import joblib
 import numpy as np
 import logging
 from datetime import datetime
 import os
-import pandas as pd
+import threading
+import time
+
+import metrics
+
+from charts import (
+    AGE_BRACKETS, CHART_FORMATS, DEFAULT_DPI, chart_cache, chart_key, chart_version, normalize_pyramid,
+    render_pyramid
+)
+from cohort_engine import FEMALE, MALE, initial_cohorts, project_cohorts, pyramid_percentages
+from country_store import HISTORY_INDICATORS, fold_name
+from data_artifact import load_country_store
+from feature_schema import parse_feature_request
+from model_registry import ModelRegistry
+from report_export import DEFAULT_SCENARIOS, EXPORT_FORMATS, ExportManager, scenario_projections
+from response_cache import ResponseCache, cache_key
+from scenario_solver import (
+    DEFAULT_BOUNDS, DEFAULT_REFINEMENTS, DEFAULT_RESOLUTION, GOALS, TARGET_TYPES, solve_scenario
+)
+from projection_engine import (
+    START_YEAR, predict_rate_changes_batch, project_scenarios,
+    project_trajectory, scenario_grid_slice, summarize_projections
+)
+from streaming import STREAM_FORMATS, batch_events, encode_stream, projection_events, stream_format
+from uncertainty import (
+    DEFAULT_PERCENTILES, SAMPLING_METHODS, project_samples, projection_bands, tree_rate_changes
+)
+from worker_pool import WorkerPool
 
 app = Flask(__name__)
 
@@ -17,37 +39,95 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-AGE_BRACKETS = [
-    "0-9", "10-19", "20-29", "30-39", "40-49",
-    "50-59", "60-69", "70-79", "80-89", "90-99", "100+"
-]
+# Country facts from demographics.json and the CSVs, indexed by name (see country_store.py);
+# memory-mapped from the compiled data artifact when it is up to date (see data_artifact.py)
+COUNTRY_STORE = load_country_store()
 
-# Load demographics data from JSON file for filling in frontend
-def load_demographics_data():
-    try:
-        with open('demographics.json', 'r') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        logger.error("demographics.json file not found")
-        return {}
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parsing demographics.json: {e}")
-        return {}
-
-DEMOGRAPHICS_DATA = load_demographics_data()
-
-# Load the trained AI models with error handling
-try:
-    birth_model = joblib.load("birth_model.pkl")
-    death_model = joblib.load("death_model.pkl")
-    migration_model = joblib.load("migration_model.pkl")
-    logger.info("AI models loaded successfully")
-except FileNotFoundError as e:
-    logger.error(f"Model file not found: {e}")
-    birth_model = death_model = migration_model = None
-except Exception as e:
-    logger.error(f"Error loading models: {e}")
-    birth_model = death_model = migration_model = None
+# Optional process pool for chart drawing and model evaluation (see worker_pool.py / asgi.py)
+worker_pool = WorkerPool.from_env()
+
+# The AI models are loaded lazily on first use (see model_registry.py)
+model_registry = ModelRegistry.from_env(pool=worker_pool)
+
+# Whole response bodies of the expensive routes, keyed by payload and the model, data or chart version
+# they were built from (see response_cache.py)
+response_cache = ResponseCache.from_env()
+CHART_VERSION = chart_version()
+
+# Bulk PDF/ZIP report jobs, drawn on their own process pool (see report_export.py)
+export_manager = ExportManager.from_env()
+
+# Routes whose work goes to the worker pool; they are refused with 503 when it is saturated
+POOLED_ENDPOINTS = {
+    "generate_chart", "pyramid_chart", "predict", "project_population",
+    "project_population_batch", "project_population_stream",
+    "project_population_batch_stream", "compare_countries", "solve_scenario_endpoint",
+}
+# Of those, the routes that look in the response cache first and only take a slot on a miss
+CACHE_FIRST_ENDPOINTS = {
+    "generate_chart", "project_population", "project_population_stream", "solve_scenario_endpoint",
+}
+
+PROFILE_SORT_KEYS = {"cumulative", "tottime", "calls", "ncalls", "time"}
+
+@app.before_request
+def start_request_metrics():
+    if metrics.enabled:
+        g.request_start = time.perf_counter()
+    if metrics.profiling_enabled and "X-Profile" in request.headers:
+        g.profiler = metrics.start_profile()
+
+@app.after_request
+def record_request_metrics(response):
+    status = response.status_code
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        # The profiled request answers with its pstats summary instead of its body
+        sort = request.headers.get("X-Profile", "").lower()
+        summary = metrics.finish_profile(profiler, sort if sort in PROFILE_SORT_KEYS else "cumulative")
+        # The original body is never sent; closing it runs its close callbacks (a stream's pool slot release)
+        response.close()
+        response = Response(summary, mimetype="text/plain")
+        response.headers["X-Profile-Status"] = str(status)
+    start = g.pop("request_start", None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.observe_request(route, request.method, status, time.perf_counter() - start)
+    return response
+
+@app.teardown_request
+def stop_abandoned_profile(error=None):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        metrics.finish_profile(profiler)
+
+def take_pool_slot():
+    """Admits the request to the worker pool; returns the 503 response to send when it is saturated"""
+    if worker_pool is None or g.get("pool_slot") or g.get("skip_admission"):
+        return None
+    if not worker_pool.admit():
+        response = jsonify({"error": "Server busy, please retry"})
+        response.status_code = 503
+        response.headers["Retry-After"] = "1"
+        return response
+    g.pool_slot = True
+    return None
+
+@app.before_request
+def admit_pooled_request():
+    if request.endpoint not in POOLED_ENDPOINTS or request.endpoint in CACHE_FIRST_ENDPOINTS:
+        return None
+    return take_pool_slot()
+
+@app.teardown_request
+def release_pooled_request(error=None):
+    # Streams hand their slot to the response instead (see streaming_response)
+    if g.pop("pool_slot", False):
+        worker_pool.release()
+
+def chart_renderer():
+    """Draws in the worker pool when there is one, otherwise on the request thread"""
+    return worker_pool.render_chart if worker_pool is not None else None
 
 @app.route("/")
 def index():
@@ -57,25 +137,45 @@ def index():
 def get_country_data(country):
     """Gets demographic data for a specified country"""
     try:
-        country_lower = country.lower()
-        if country_lower not in DEMOGRAPHICS_DATA:
+        # The response body is serialized once per country and reused
+        body = COUNTRY_STORE.response_json(country)
+        if body is None:
             return jsonify({"error": f"Country '{country}' not found"}), 404
-        
-        data = DEMOGRAPHICS_DATA[country_lower]
+        return Response(body, mimetype="application/json")
+
+    except Exception as e:
+        logger.error(f"Error getting country data: {e}")
+        return jsonify({"error": "Failed to retrieve country data"}), 500
+
+@app.route("/get-countries-data")
+def get_countries_data():
+    """Gets current indicators and a year range of history for many countries at once"""
+    try:
+        countries = request.args.get("countries", "all")
+        names = "all" if countries.strip().lower() == "all" else [c for c in countries.split(",") if c.strip()]
+        start_year = request.args.get("start", type=int)
+        end_year = request.args.get("end", type=int)
+
+        try:
+            rows = COUNTRY_STORE.rows(names)
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 404
+
+        profiles = COUNTRY_STORE.profiles(rows)
+        years, history = COUNTRY_STORE.history_range(rows, start_year, end_year)
+        # NaN marks missing history; JSON has no NaN, so send null
+        history = np.where(np.isnan(history), None, history)
+
         return jsonify({
-            "population": data.get("population", 0),
-            "male_pyramid_data": data.get("male_pyramid_data", [0] * 11),
-            "female_pyramid_data": data.get("female_pyramid_data", [0] * 11),
-            "gdp_per_capita": data.get("gdp_per_capita", 0),
-            "life_expectancy": data.get("life_expectancy", 70),
-            "urbanization": data.get("urbanization", 0),
-            "birth_rate": data.get("birth_rate", None),
-            "death_rate": data.get("death_rate", None),
-            "migration_rate": data.get("migration_rate", None)
+            **{key: values.tolist() for key, values in profiles.items()},
+            "history": {
+                "years": years.tolist(),
+                **{name: history[:, :, i].tolist() for i, name in enumerate(HISTORY_INDICATORS)}
+            }
         })
 
     except Exception as e:
-        logger.error(f"Error getting country data: {e}")
+        logger.error(f"Error getting countries data: {e}")
         return jsonify({"error": "Failed to retrieve country data"}), 500
 
 @app.route("/generate-chart", methods=["POST"])
@@ -85,50 +185,39 @@ def generate_chart():
         if not data:
             return jsonify({"error": "No data provided"}), 400
             
-        males = [-float(x) for x in data.get("male", [0]*len(AGE_BRACKETS))]
+        males = [float(x) for x in data.get("male", [0]*len(AGE_BRACKETS))]
         females = [float(x) for x in data.get("female", [0]*len(AGE_BRACKETS))]
 
         # Validate data lengths
         if len(males) != len(AGE_BRACKETS) or len(females) != len(AGE_BRACKETS):
             return jsonify({"error": "Invalid data length"}), 400
 
-        # Create the chart with improved styling
-        fig, ax = plt.subplots(figsize=(10, 8))
-        y_pos = list(range(len(AGE_BRACKETS)))
-
-        # Create horizontal bar chart
-        bars_male = ax.barh(y_pos, males, color='#2196F3', label='Male', alpha=0.8)
-        bars_female = ax.barh(y_pos, females, color='#E91E63', label='Female', alpha=0.8)
-
-        # Customize the chart
-        ax.set_yticks(y_pos)
-        ax.set_yticklabels(AGE_BRACKETS)
-        ax.set_xlabel('Population %', fontsize=12, fontweight='bold')
-        ax.set_title('Population Pyramid', fontsize=16, fontweight='bold', pad=20)
-        ax.legend(loc='upper right')
-        ax.grid(axis='x', linestyle='--', alpha=0.7)
-        ax.axvline(x=0, color='black', linewidth=0.8)
-
-        # Add percentage labels on bars
-        for i, (m, f) in enumerate(zip(males, females)):
-            if abs(m) > 0.5:  # Only show label if bar is significant
-                ax.text(m/2, i, f'{abs(m):.1f}%', ha='center', va='center', 
-                       fontsize=8, color='white', fontweight='bold')
-            if f > 0.5:
-                ax.text(f/2, i, f'{f:.1f}%', ha='center', va='center', 
-                       fontsize=8, color='white', fontweight='bold')
-
-        # Improve layout
-        plt.tight_layout()
+        chart_format = str(data.get("format", "png")).lower()
+        if chart_format not in CHART_FORMATS:
+            return jsonify({"error": f"Unsupported chart format '{chart_format}'"}), 400
+        dpi = int(data.get("dpi", DEFAULT_DPI))
+        if not 10 <= dpi <= 600:
+            return jsonify({"error": "dpi must be between 10 and 600"}), 400
+
+        # Charts do not depend on the models, only on how they are drawn
+        key = cache_key(
+            "generate_chart", {"male": males, "female": females, "format": chart_format, "dpi": dpi}, CHART_VERSION
+        )
+        body = response_cache.get(key)
+        if body is not None:
+            return Response(body, mimetype="application/json")
+        busy = take_pool_slot()
+        if busy is not None:
+            return busy
+
+        # Rendered once per distinct pyramid, then served from the chart cache
+        _, image = render_pyramid(males, females, chart_format, dpi, render=chart_renderer())
 
         # Convert to base64
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=150, bbox_inches='tight')
-        buf.seek(0)
-        chart_base64 = base64.b64encode(buf.read()).decode('utf-8')
-        plt.close()
+        with metrics.timed("base64_encode"):
+            chart_base64 = base64.b64encode(image).decode('utf-8')
 
-        return jsonify({"chart": chart_base64})
+        return cached_json(key, {"chart": chart_base64, "format": chart_format})
         
     except ValueError as e:
         logger.error(f"Value error in generate_chart: {e}")
@@ -137,45 +226,172 @@ def generate_chart():
         logger.error(f"Error generating chart: {e}")
         return jsonify({"error": "Failed to generate chart"}), 500
 
-@app.route("/predict", methods=["POST"])
-def predict():
+CHART_CACHE_CONTROL = "public, max-age=3600"
+
+def parse_pyramid_query(args):
+    """Reads male/female percentages from ?country= or comma-separated ?male=&female="""
+    country = args.get("country")
+    if country:
+        return COUNTRY_STORE.pyramid(country)
+    males = [float(x) for x in args.get("male", "").split(",") if x.strip()]
+    females = [float(x) for x in args.get("female", "").split(",") if x.strip()]
+    return males, females
+
+@app.route("/chart/pyramid.<chart_format>")
+def pyramid_chart(chart_format):
+    """Serves a pyramid chart as raw PNG/SVG bytes with a strong ETag"""
     try:
-        data = request.get_json()
-        gdp = float(data.get("gdp"))
-        life = float(data.get("life"))
-        urban = float(data.get("urban"))
+        chart_format = chart_format.lower()
+        if chart_format not in CHART_FORMATS:
+            return jsonify({"error": f"Unsupported chart format '{chart_format}'"}), 404
+
+        pyramid = parse_pyramid_query(request.args)
+        if pyramid is None:
+            return jsonify({"error": f"Country '{request.args.get('country')}' not found"}), 404
+        males, females = pyramid
+        if len(males) != len(AGE_BRACKETS) or len(females) != len(AGE_BRACKETS):
+            return jsonify({"error": "Invalid data length"}), 400
+
+        dpi = int(request.args.get("dpi", DEFAULT_DPI))
+        if not 10 <= dpi <= 600:
+            return jsonify({"error": "dpi must be between 10 and 600"}), 400
+
+        # The ETag is the content hash, so a revalidation never needs to render
+        etag = chart_key(*normalize_pyramid(males, females), chart_format, dpi)
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            _, image = render_pyramid(males, females, chart_format, dpi, render=chart_renderer())
+            response = Response(image, mimetype=CHART_FORMATS[chart_format])
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = CHART_CACHE_CONTROL
+        return response
 
-        # List of full feature names used during training
-        full_features = birth_model.feature_names_in_  # requires scikit-learn >= 1.0
+    except ValueError as e:
+        logger.error(f"Value error in pyramid_chart: {e}")
+        return jsonify({"error": "Invalid numeric values provided"}), 400
+    except Exception as e:
+        logger.error(f"Error serving chart: {e}")
+        return jsonify({"error": "Failed to generate chart"}), 500
 
-        # Initialize all to 0
-        input_data = dict.fromkeys(full_features, 0.0)
+MAX_PREDICT_ROWS = 100000
 
-        # Set the actual values for the 3 inputs
-        input_data['GDP_per_capita'] = gdp
-        input_data['Life_expectancy'] = life
-        input_data['Urbanization'] = urban
+@app.route("/predict", methods=["POST"])
+def predict():
+    """Rate predictions for one feature row, or per row for a {"rows": [...]} or columnar body"""
+    try:
+        data = request.get_json()
+        columns, regions, single = parse_feature_request(data)
+        n_rows = len(columns["gdp"])
+        if not 0 < n_rows <= MAX_PREDICT_ROWS:
+            return jsonify({"error": f"Between 1 and {MAX_PREDICT_ROWS} rows are allowed"}), 400
 
-        # Optionally, set the correct region if known — for now, leave region dummy-encoded as 0s
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
 
-        # Convert to DataFrame
-        input_df = pd.DataFrame([input_data])
+        with metrics.timed("feature_build"):
+            matrices = model_registry.feature_matrices(columns, regions)
 
-        # Make predictions
-        birth = birth_model.predict(input_df)[0]
-        death = death_model.predict(input_df)[0]
-        migration = migration_model.predict(input_df)[0]
+        with metrics.timed("model_predict"):
+            birth, death, migration = (model.predict(X) for model, X in zip(models, matrices))
 
+        if single:
+            return jsonify({
+                "birthRate": float(birth[0]),
+                "deathRate": float(death[0]),
+                "migrationRate": float(migration[0])
+            })
         return jsonify({
-            "birthRate": birth,
-            "deathRate": death,
-            "migrationRate": migration
+            "birthRate": birth.tolist(),
+            "deathRate": death.tolist(),
+            "migrationRate": migration.tolist()
         })
 
     except Exception as e:
-        print("Value error in predict:", e)
+        logger.error(f"Value error in predict: {e}")
         return jsonify({"error": "AI Prediction Error: Invalid numeric values provided"}), 400
 
+def pyramid_from_request(data):
+    """Pyramid percentages from the request body, or the stored pyramid of data['country']"""
+    if "male" in data or "female" in data:
+        males = [float(x) for x in data.get("male", [])]
+        females = [float(x) for x in data.get("female", [])]
+        if len(males) != len(AGE_BRACKETS) or len(females) != len(AGE_BRACKETS):
+            return None
+        return males, females
+    if data.get("country"):
+        return COUNTRY_STORE.pyramid(data["country"])
+    return None
+
+def project_cohort_response(population, birth_rate, death_rate, migration_rate,
+                            rate_changes, years_to_project, pyramid, growth_rates):
+    """Runs the cohort-component engine for one scenario and builds the response body"""
+    if rate_changes is not None:
+        rate_changes = tuple(np.atleast_1d(change) for change in rate_changes)
+    _, final_rates, rate_paths = project_scenarios(
+        population, birth_rate, death_rate, migration_rate,
+        rate_changes, years_to_project, return_rate_paths=True
+    )
+    cohorts = initial_cohorts(population, *pyramid)
+    history = project_cohorts(cohorts, *rate_paths)[:, 0]  # (years + 1, sex, bracket)
+    percentages = np.round(pyramid_percentages(history), 3)
+
+    return {
+        "years": list(range(START_YEAR, START_YEAR + years_to_project + 1)),
+        "population": np.rint(history.sum(axis=(1, 2))).astype(np.int64).tolist(),
+        "pyramids": {
+            "male": percentages[:, MALE].tolist(),
+            "female": percentages[:, FEMALE].tolist()
+        },
+        "metadata": {
+            "mode": "cohort",
+            "growth_rates": growth_rates,
+            "final_rates": {
+                "birth": round(float(final_rates[0][0]) * 1000, 3),
+                "death": round(float(final_rates[1][0]) * 1000, 3),
+                "migration": round(float(final_rates[2][0]) * 1000, 3)
+            }
+        }
+    }
+
+def projection_cache_key(route, payload, mode):
+    """Response cache key for a projection, or None when the answer is not reproducible"""
+    # An unseeded probabilistic projection draws a fresh seed every time
+    if mode == "probabilistic" and payload.get("seed") is None:
+        return None
+    return cache_key(route, payload, model_data_version())
+
+def model_data_version():
+    """Cache version of responses built from the models and the country data (pyramids, baselines)"""
+    return f"{model_registry.version()}:{COUNTRY_STORE.data_version}"
+
+def cached_json(key, result):
+    """jsonify(result), also storing the body in the response cache when there is a key"""
+    response = jsonify(result)
+    if key is not None:
+        response_cache.put(key, response.get_data())
+    return response
+
+DEFAULT_MONTE_CARLO_SAMPLES = 1000
+MAX_MONTE_CARLO_SAMPLES = 10000
+
+def monte_carlo_options(data):
+    """Validated (samples, seed, sampling, percentiles) for a probabilistic projection"""
+    samples = int(data.get("samples", DEFAULT_MONTE_CARLO_SAMPLES))
+    if not 1 <= samples <= MAX_MONTE_CARLO_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {MAX_MONTE_CARLO_SAMPLES}")
+    seed = data.get("seed")
+    # Without a seed one is drawn and returned, so any response can be reproduced
+    seed = int(np.random.SeedSequence().generate_state(1)[0]) if seed is None else int(seed)
+    sampling = str(data.get("sampling", "tree")).lower()
+    if sampling not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method '{sampling}'")
+    percentiles = [float(p) for p in data.get("percentiles", DEFAULT_PERCENTILES)]
+    if not percentiles or not all(0 <= p <= 100 for p in percentiles):
+        raise ValueError("percentiles must be between 0 and 100")
+    return samples, seed, sampling, percentiles
+
 @app.route("/project_population", methods=["POST"])
 def project_population():
     """Project population using test.py logic - predicting rate changes based on growth scenarios"""
@@ -195,77 +411,67 @@ def project_population():
         user_urban_growth = float(data.get("urbanGrowth", 1.0))
         
         years_to_project = int(data.get("yearsToProject", 75))  # Default to 75 years (2025-2100)
+
+        # "cohort" ages the male/female pyramid forward instead of a single total;
+        # "probabilistic" adds percentile bands from the spread of the forests' trees
+        mode = str(data.get("mode", "total")).lower()
+        if mode not in ("total", "cohort", "probabilistic"):
+            return jsonify({"error": f"Unknown projection mode '{mode}'"}), 400
         
         if population <= 0:
             return jsonify({"error": "Invalid population value"}), 400
+        if years_to_project < 0:
+            return jsonify({"error": "yearsToProject must not be negative"}), 400
+
+        if mode == "cohort":
+            pyramid = pyramid_from_request(data)
+            if pyramid is None:
+                return jsonify({"error": "Cohort mode needs 11-bracket 'male'/'female' data or a known 'country'"}), 400
+        if mode == "probabilistic":
+            try:
+                samples, seed, sampling, percentiles = monte_carlo_options(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
         
-        if not all([birth_model, death_model, migration_model]):
+        if model_registry.get_models() is None:
             return jsonify({"error": "AI models not available"}), 500
 
-        # Lists to store yearly data
-        years = list(range(2025, 2025 + years_to_project + 1))
-        populations = [population]
-        
-        current_population = population
-        current_birth_rate = initial_birth_rate
-        current_death_rate = initial_death_rate
-        current_migration_rate = initial_migration_rate
+        key = projection_cache_key("project_population", data, mode)
+        body = response_cache.get(key) if key is not None else None
+        if body is not None:
+            return Response(body, mimetype="application/json")
+        busy = take_pool_slot()
+        if busy is not None:
+            return busy
 
-        # Simulation loop following test.py logic
-        for year in range(1, years_to_project + 1):
-            try:
-                # Prepare input for AI models (growth rates as features)
-                X = np.array([[user_gdp_growth, user_life_growth, user_urban_growth]])
-                
-                # Predict rate changes using AI models
-                birth_change = birth_model.predict(X)[0]
-                death_change = death_model.predict(X)[0]
-                migration_change = migration_model.predict(X)[0]
-                
-                # Clip changes to reasonable bounds (more conservative)
-                birth_change = np.clip(birth_change, -3, 3)    # max ±3% change per year
-                death_change = np.clip(death_change, -3, 3)    # max ±3% change per year  
-                migration_change = np.clip(migration_change, -1, 1)  # max ±1% for migration
-                
-                # Apply the changes to current rates
-                current_birth_rate *= (1 + birth_change / 100)
-                current_death_rate *= (1 + death_change / 100)
-                current_migration_rate *= (1 + migration_change / 100)
-                
-                # Ensure rates stay within realistic demographic bounds
-                current_birth_rate = max(0.005, min(0.050, current_birth_rate))  # 5-50 per 1000
-                current_death_rate = max(0.005, min(0.050, current_death_rate))   # 5-50 per 1000
-                current_migration_rate = max(-0.030, min(0.030, current_migration_rate))  # ±30 per 1000
-                
-                # Additional demographic reality checks
-                # Birth rates typically don't exceed death rates by more than 3% in modern contexts
-                if current_birth_rate - current_death_rate > 0.035:
-                    current_birth_rate = current_death_rate + 0.035
-                
-                # Death rates rarely go below 5 per 1000 even in healthiest populations
-                if current_death_rate < 0.005:
-                    current_death_rate = 0.005
-                
-                # Calculate new population
-                net_rate = current_birth_rate - current_death_rate + current_migration_rate
-                current_population = current_population * (1 + net_rate)
-                
-                # Ensure population doesn't go negative or grow unrealistically
-                current_population = max(current_population, 1000)
-                if current_population > population * 10:  # Cap at 10x original population
-                    current_population = population * 10
-                
-                populations.append(round(current_population))
-                
-            except Exception as model_error:
-                logger.warning(f"AI model prediction failed for year {year}: {model_error}")
-                # Fallback: use previous rates
-                net_rate = current_birth_rate - current_death_rate + current_migration_rate
-                current_population = current_population * (1 + net_rate)
-                current_population = max(current_population, 1000)
-                populations.append(round(current_population))
+        years = list(range(START_YEAR, START_YEAR + years_to_project + 1))
 
-        return jsonify({
+        # Predict rate changes once for this scenario (cached across requests)
+        try:
+            rate_changes = model_registry.rate_cache.get(user_gdp_growth, user_life_growth, user_urban_growth)
+        except Exception as model_error:
+            logger.warning(f"AI model prediction failed: {model_error}")
+            # Fallback: keep the starting rates for every year
+            rate_changes = None
+            key = None  # not what the models would answer, so not cached
+            if mode == "probabilistic":
+                # The bands come from the same models, so there is no fallback for them
+                return jsonify({"error": "Model inference unavailable for probabilistic projection"}), 503
+
+        if mode == "cohort":
+            return cached_json(key, project_cohort_response(
+                population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+                rate_changes, years_to_project, pyramid,
+                {"gdp": user_gdp_growth, "life": user_life_growth, "urban": user_urban_growth}
+            ))
+
+        populations, final_rates = project_trajectory(
+            population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+            rate_changes, years_to_project
+        )
+        current_birth_rate, current_death_rate, current_migration_rate = final_rates
+
+        result = {
             "years": years, 
             "population": populations,
             "metadata": {
@@ -280,7 +486,23 @@ def project_population():
                     "migration": round(current_migration_rate * 1000, 3)
                 }
             }
-        })
+        }
+
+        if mode == "probabilistic":
+            # "population" stays the forest-mean trajectory; the bands come from per-tree draws
+            tree_changes = tree_rate_changes(
+                model_registry.get_models(), user_gdp_growth, user_life_growth, user_urban_growth
+            )
+            sampled = project_samples(
+                population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+                tree_changes, years_to_project, samples, seed, sampling
+            )
+            result["bands"] = {
+                key: values.tolist() for key, values in projection_bands(sampled, percentiles).items()
+            }
+            result["metadata"].update(mode="probabilistic", samples=samples, seed=seed, sampling=sampling)
+
+        return cached_json(key, result)
 
     except ValueError as e:
         logger.error(f"Value error in project_population: {e}")
@@ -289,21 +511,674 @@ def project_population():
         logger.error(f"Error in population projection: {e}")
         return jsonify({"error": "Population projection failed"}), 500
 
+MAX_BATCH_SCENARIOS = 100000
+MAX_BATCH_CELLS = 10_000_000  # (years + 1) x scenarios held at once; /batch/stream has no such limit
+
+def parse_grid_axis(spec, default):
+    """Turns a grid axis given as a list or a {start, stop, step} range into values"""
+    if spec is None:
+        return [default]
+    if isinstance(spec, dict):
+        start = float(spec["start"])
+        stop = float(spec["stop"])
+        step = float(spec.get("step", 1.0))
+        if step <= 0:
+            raise ValueError("Grid step must be positive")
+        # Include the stop value when it lands on the grid
+        count = int(np.floor((stop - start) / step + 1e-9)) + 1
+        return start + step * np.arange(max(count, 0))
+    return [float(x) for x in spec]
+
+def parse_batch_request(data, max_scenarios, max_years=None):
+    """Validated starting values and scenarios shared by the batch routes.
+
+    Returns (population, (birth, death, migration) rates per person, years,
+    scenario count, scenario_rows) where scenario_rows(start, stop) gives
+    those rows of the N x 3 scenario matrix; grids are only expanded as rows
+    are requested.  Raises ValueError with a message for the client.
+    """
+    # Scenarios are either listed explicitly or described as a grid
+    if "scenarios" in data:
+        if not isinstance(data["scenarios"], list) or not all(isinstance(s, dict) for s in data["scenarios"]):
+            raise ValueError("scenarios must be a list of objects")
+    elif "grid" in data:
+        if not isinstance(data["grid"], dict):
+            raise ValueError("grid must be an object")
+    else:
+        raise ValueError("Provide either 'scenarios' or 'grid'")
+
+    try:
+        population = float(data.get("population", 0))
+        rates = (
+            float(data.get("birthRate", 20)) / 1000,
+            float(data.get("deathRate", 10)) / 1000,
+            float(data.get("migrationRate", 0)) / 1000,
+        )
+        years_to_project = int(data.get("yearsToProject", 75))
+
+        if "scenarios" in data:
+            scenarios = np.array([
+                [float(s.get("gdpGrowth", 2.0)), float(s.get("lifeGrowth", 1.0)), float(s.get("urbanGrowth", 1.0))]
+                for s in data["scenarios"]
+            ], dtype=float).reshape(-1, 3)
+            n_scenarios = len(scenarios)
+            scenario_rows = lambda start, stop: scenarios[start:stop]
+        else:
+            grid = data["grid"]
+            axes = (
+                parse_grid_axis(grid.get("gdpGrowth"), 2.0),
+                parse_grid_axis(grid.get("lifeGrowth"), 1.0),
+                parse_grid_axis(grid.get("urbanGrowth"), 1.0)
+            )
+            n_scenarios = int(np.prod([len(axis) for axis in axes]))
+            scenario_rows = lambda start, stop: scenario_grid_slice(*axes, start, stop)
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid numeric values provided")
+
+    if population <= 0:
+        raise ValueError("Invalid population value")
+    if max_years is None and years_to_project < 0:
+        raise ValueError("yearsToProject must not be negative")
+    if max_years is not None and not 0 <= years_to_project <= max_years:
+        raise ValueError(f"yearsToProject must be between 0 and {max_years}")
+    if n_scenarios == 0:
+        raise ValueError("No scenarios provided")
+    if n_scenarios > max_scenarios:
+        raise ValueError(f"Too many scenarios (max {max_scenarios})")
+    return population, rates, years_to_project, n_scenarios, scenario_rows
+
+@app.route("/project_population/batch", methods=["POST"])
+def project_population_batch():
+    """Project many growth scenarios for one population in a single vectorized pass"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        try:
+            population, rates, years_to_project, n_scenarios, scenario_rows = parse_batch_request(
+                data, MAX_BATCH_SCENARIOS
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        initial_birth_rate, initial_death_rate, initial_migration_rate = rates
+        summary_only = bool(data.get("summaryOnly", False))
+
+        if (years_to_project + 1) * n_scenarios > MAX_BATCH_CELLS:
+            return jsonify({
+                "error": f"(yearsToProject + 1) x scenarios must not exceed {MAX_BATCH_CELLS}; "
+                         "use /project_population/batch/stream for larger sweeps"
+            }), 400
+        scenarios = scenario_rows(0, n_scenarios)
+
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
+
+        rate_changes = predict_rate_changes_batch(models, scenarios)
+        populations, final_rates = project_scenarios(
+            population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+            rate_changes, years_to_project
+        )
+
+        result = {
+            "years": list(range(START_YEAR, START_YEAR + years_to_project + 1)),
+            "scenarios": {
+                "gdp": scenarios[:, 0].tolist(),
+                "life": scenarios[:, 1].tolist(),
+                "urban": scenarios[:, 2].tolist()
+            },
+            "final_rates": {
+                "birth": np.round(final_rates[0] * 1000, 3).tolist(),
+                "death": np.round(final_rates[1] * 1000, 3).tolist(),
+                "migration": np.round(final_rates[2] * 1000, 3).tolist()
+            },
+            "summary": {
+                key: values.tolist() for key, values in summarize_projections(populations).items()
+            }
+        }
+        if not summary_only:
+            # One trajectory per scenario, in the same order as "scenarios"
+            result["population"] = populations.T.tolist()
+
+        return jsonify(result)
+
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f"Value error in project_population_batch: {e}")
+        return jsonify({"error": "Invalid numeric values provided"}), 400
+    except Exception as e:
+        logger.error(f"Error in batch population projection: {e}")
+        return jsonify({"error": "Batch population projection failed"}), 500
+
+MAX_STREAM_YEARS = 10000
+MAX_STREAM_SCENARIOS = 10000000
+
+MAX_CACHED_STREAM_YEARS = 1000
+
+def request_stream_format(data):
+    return stream_format(data.get("format"), request.headers.get("Accept", ""))
+
+def stream_headers(response):
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # let proxies pass each year through
+    return response
+
+def streaming_response(events, data, key=None):
+    """Wraps an event generator as an NDJSON (default) or Server-Sent Events response.
+
+    With a key, the body is put in the response cache once the stream has
+    finished cleanly.  A worker pool slot taken for the request is held
+    until the server closes the response: the body is only produced after
+    teardown_request has run.
+    """
+    fmt = request_stream_format(data)
+    on_complete = None if key is None else (lambda body: response_cache.put(key, body))
+    response = stream_headers(Response(encode_stream(events, fmt, on_complete), mimetype=STREAM_FORMATS[fmt]))
+    if g.pop("pool_slot", False):
+        response.call_on_close(worker_pool.release)
+    return response
+
+@app.route("/project_population/stream", methods=["POST"])
+def project_population_stream():
+    """Like /project_population, but sends each projected year as soon as it is computed"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        population = float(data.get("population", 0))
+        initial_birth_rate = float(data.get("birthRate", 20)) / 1000
+        initial_death_rate = float(data.get("deathRate", 10)) / 1000
+        initial_migration_rate = float(data.get("migrationRate", 0)) / 1000
+        user_gdp_growth = float(data.get("gdpGrowth", 2.0))
+        user_life_growth = float(data.get("lifeGrowth", 1.0))
+        user_urban_growth = float(data.get("urbanGrowth", 1.0))
+        years_to_project = int(data.get("yearsToProject", 75))
+        mode = str(data.get("mode", "total")).lower()
+
+        if mode not in ("total", "cohort", "probabilistic"):
+            return jsonify({"error": f"Unknown projection mode '{mode}'"}), 400
+        if population <= 0:
+            return jsonify({"error": "Invalid population value"}), 400
+        if not 0 <= years_to_project <= MAX_STREAM_YEARS:
+            return jsonify({"error": f"yearsToProject must be between 0 and {MAX_STREAM_YEARS}"}), 400
+        fmt = request_stream_format(data)
+
+        pyramid = samples = None
+        if mode == "cohort":
+            pyramid = pyramid_from_request(data)
+            if pyramid is None:
+                return jsonify({"error": "Cohort mode needs 11-bracket 'male'/'female' data or a known 'country'"}), 400
+        if mode == "probabilistic":
+            n_samples, seed, sampling, percentiles = monte_carlo_options(data)
+
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
+
+        # A finished stream of moderate length is cached whole and replayed in one piece
+        key = None
+        if years_to_project <= MAX_CACHED_STREAM_YEARS:
+            key = projection_cache_key("project_population/stream", {"body": data, "format": fmt}, mode)
+        body = response_cache.get(key) if key is not None else None
+        if body is not None:
+            return stream_headers(Response(body, mimetype=STREAM_FORMATS[fmt]))
+        busy = take_pool_slot()
+        if busy is not None:
+            return busy
+
+        try:
+            rate_changes = model_registry.rate_cache.get(user_gdp_growth, user_life_growth, user_urban_growth)
+        except Exception as model_error:
+            logger.warning(f"AI model prediction failed: {model_error}")
+            rate_changes = None
+            key = None
+            if mode == "probabilistic":
+                return jsonify({"error": "Model inference unavailable for probabilistic projection"}), 503
+
+        metadata = {
+            "mode": mode,
+            "growth_rates": {"gdp": user_gdp_growth, "life": user_life_growth, "urban": user_urban_growth}
+        }
+        if mode == "probabilistic":
+            tree_changes = tree_rate_changes(models, user_gdp_growth, user_life_growth, user_urban_growth)
+            samples = (tree_changes, n_samples, seed, sampling, percentiles)
+            metadata.update(samples=n_samples, seed=seed, sampling=sampling)
+
+        events = projection_events(
+            population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+            rate_changes, years_to_project, START_YEAR, metadata, pyramid=pyramid, samples=samples
+        )
+        return streaming_response(events, data, key)
+
+    except ValueError as e:
+        logger.error(f"Value error in project_population_stream: {e}")
+        return jsonify({"error": str(e) or "Invalid numeric values provided"}), 400
+    except Exception as e:
+        logger.error(f"Error starting projection stream: {e}")
+        return jsonify({"error": "Population projection failed"}), 500
+
+@app.route("/project_population/batch/stream", methods=["POST"])
+def project_population_batch_stream():
+    """Like /project_population/batch, but sends one line per scenario in bounded chunks"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        try:
+            population, rates, years_to_project, n_scenarios, scenario_rows = parse_batch_request(
+                data, MAX_STREAM_SCENARIOS, MAX_STREAM_YEARS
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        initial_birth_rate, initial_death_rate, initial_migration_rate = rates
+        summary_only = bool(data.get("summaryOnly", False))
+        stream_format(data.get("format"))
+
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
+
+        events = batch_events(
+            models, population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+            years_to_project, START_YEAR, n_scenarios, scenario_rows, summary_only
+        )
+        return streaming_response(events, data)
+
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f"Value error in project_population_batch_stream: {e}")
+        return jsonify({"error": "Invalid numeric values provided"}), 400
+    except Exception as e:
+        logger.error(f"Error starting batch projection stream: {e}")
+        return jsonify({"error": "Batch population projection failed"}), 500
+
+DEFAULT_SCENARIO = {"gdpGrowth": 2.0, "lifeGrowth": 1.0, "urbanGrowth": 1.0}
+
+def country_baselines(countries):
+    """Stored profiles of the selected countries ("all", a name or a list) and their starting rates per person.
+
+    Raises KeyError for unknown countries and ValueError when none are
+    selected or one has no baseline population.
+    """
+    if isinstance(countries, str) and countries.lower() != "all":
+        countries = [countries]
+    rows = COUNTRY_STORE.rows("all" if isinstance(countries, str) else countries)
+    if len(rows) == 0:
+        raise ValueError("No countries selected")
+
+    profiles = COUNTRY_STORE.profiles(rows)
+    missing = profiles["country"][profiles["population"] <= 0]
+    if len(missing):
+        raise ValueError(f"No baseline population for: {', '.join(missing)}")
+
+    # Missing rates fall back to the same defaults /project_population uses
+    rates = (
+        np.nan_to_num(profiles["birth_rate"], nan=20.0) / 1000,
+        np.nan_to_num(profiles["death_rate"], nan=10.0) / 1000,
+        np.nan_to_num(profiles["migration_rate"], nan=0.0) / 1000,
+    )
+    return profiles, rates
+
+@app.route("/compare", methods=["POST"])
+def compare_countries():
+    """Project several countries side by side from their stored baselines in one vectorized pass"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        years_to_project = int(data.get("yearsToProject", 75))
+        if years_to_project < 0:
+            return jsonify({"error": "yearsToProject must not be negative"}), 400
+
+        # A shared scenario, optionally overridden per country
+        shared = data.get("scenario", {})
+        overrides = data.get("scenarios", {})
+        if not isinstance(shared, dict):
+            return jsonify({"error": "scenario must be an object"}), 400
+        if not isinstance(overrides, dict) or not all(isinstance(s, dict) for s in overrides.values()):
+            return jsonify({"error": "scenarios must map country names to objects"}), 400
+
+        try:
+            profiles, (birth, death, migration) = country_baselines(data.get("countries", "all"))
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        shared = {**DEFAULT_SCENARIO, **shared}
+        per_country = {fold_name(k): v for k, v in overrides.items()}
+        scenarios = []
+        for name in profiles["country"]:
+            scenario = {**shared, **per_country.get(fold_name(name), {})}
+            scenarios.append([float(scenario["gdpGrowth"]), float(scenario["lifeGrowth"]), float(scenario["urbanGrowth"])])
+        scenarios = np.array(scenarios, dtype=float)
+
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
+
+        rate_changes = predict_rate_changes_batch(models, scenarios)
+        populations, final_rates = project_scenarios(
+            profiles["population"], birth, death, migration, rate_changes, years_to_project
+        )
+
+        return jsonify({
+            "years": list(range(START_YEAR, START_YEAR + years_to_project + 1)),
+            "countries": profiles["country"].tolist(),
+            "population": populations.T.tolist(),
+            # Population relative to the start year, for plotting countries of different sizes together
+            "population_index": np.round(populations / populations[0], 6).T.tolist(),
+            "scenarios": {
+                "gdp": scenarios[:, 0].tolist(),
+                "life": scenarios[:, 1].tolist(),
+                "urban": scenarios[:, 2].tolist()
+            },
+            "final_rates": {
+                "birth": np.round(final_rates[0] * 1000, 3).tolist(),
+                "death": np.round(final_rates[1] * 1000, 3).tolist(),
+                "migration": np.round(final_rates[2] * 1000, 3).tolist()
+            },
+            "summary": {
+                key: values.tolist() for key, values in summarize_projections(populations).items()
+            }
+        })
+
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f"Value error in compare_countries: {e}")
+        return jsonify({"error": "Invalid numeric values provided"}), 400
+    except Exception as e:
+        logger.error(f"Error in country comparison: {e}")
+        return jsonify({"error": "Country comparison failed"}), 500
+
+MAX_SOLVER_RESOLUTION = 40
+MAX_SOLVER_REFINEMENTS = 6
+MAX_SOLVER_YEARS = 1000
+
+@app.route("/solve_scenario", methods=["POST"])
+def solve_scenario_endpoint():
+    """Finds the growth scenarios whose projection best meets a population target"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        # Starting values default to those of a known country
+        profile = {}
+        if data.get("country"):
+            row = COUNTRY_STORE.lookup(data["country"])
+            if row is None or not COUNTRY_STORE.has_profile[row]:
+                return jsonify({"error": f"Country '{data['country']}' not found"}), 404
+            profile = COUNTRY_STORE.response_payload(row)
+
+        population = float(data.get("population", profile.get("population", 0)))
+        initial_birth_rate = float(data.get("birthRate", profile.get("birth_rate") or 20)) / 1000
+        initial_death_rate = float(data.get("deathRate", profile.get("death_rate") or 10)) / 1000
+        initial_migration_rate = float(data.get("migrationRate", profile.get("migration_rate") or 0)) / 1000
+        years_to_project = int(data.get("yearsToProject", 75))
+
+        # target: {"type": "final" | "peak" | "year", "value": N, "year": Y, "goal": "equal" | "at_least" | "at_most"}
+        target = data.get("target") or {}
+        target_type = str(target.get("type", "final")).lower()
+        goal = str(target.get("goal", "equal")).lower()
+        if target_type not in TARGET_TYPES:
+            return jsonify({"error": f"Unknown target type '{target_type}'"}), 400
+        if goal not in GOALS:
+            return jsonify({"error": f"Unknown goal '{goal}'"}), 400
+        target_value = float(target["value"])
+        target_year = None
+        if target_type == "year":
+            target_year = int(target["year"])
+            if "yearsToProject" not in data:
+                years_to_project = target_year - START_YEAR
+
+        if population <= 0 or target_value <= 0:
+            return jsonify({"error": "Population and target must be positive"}), 400
+        if not 1 <= years_to_project <= MAX_SOLVER_YEARS:
+            return jsonify({"error": f"yearsToProject must be between 1 and {MAX_SOLVER_YEARS}"}), 400
+        if target_year is not None and not START_YEAR <= target_year <= START_YEAR + years_to_project:
+            return jsonify({"error": "The target year must lie within the projection"}), 400
+
+        # bounds: {"gdpGrowth": [low, high], ...}; missing axes span the slider ranges
+        bounds_spec = data.get("bounds") or {}
+        bounds = [
+            tuple(float(x) for x in bounds_spec.get(name, default))
+            for name, default in zip(("gdpGrowth", "lifeGrowth", "urbanGrowth"), DEFAULT_BOUNDS)
+        ]
+        if not all(len(axis) == 2 and axis[0] <= axis[1] for axis in bounds):
+            return jsonify({"error": "Each bound must be a [low, high] pair"}), 400
+
+        resolution = int(data.get("resolution", DEFAULT_RESOLUTION))
+        refinements = int(data.get("refinements", DEFAULT_REFINEMENTS))
+        top = int(data.get("top", 5))
+        if not 2 <= resolution <= MAX_SOLVER_RESOLUTION:
+            return jsonify({"error": f"resolution must be between 2 and {MAX_SOLVER_RESOLUTION}"}), 400
+        if not 0 <= refinements <= MAX_SOLVER_REFINEMENTS:
+            return jsonify({"error": f"refinements must be between 0 and {MAX_SOLVER_REFINEMENTS}"}), 400
+        if not 1 <= top <= 50:
+            return jsonify({"error": "top must be between 1 and 50"}), 400
+
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
+
+        key = cache_key("solve_scenario", data, model_data_version())
+        body = response_cache.get(key)
+        if body is not None:
+            return Response(body, mimetype="application/json")
+        busy = take_pool_slot()
+        if busy is not None:
+            return busy
+
+        with metrics.timed("scenario_search"):
+            solved = solve_scenario(
+                models, population, initial_birth_rate, initial_death_rate, initial_migration_rate,
+                years_to_project, target_type, target_value, goal, target_year, bounds,
+                resolution, refinements, top
+            )
+
+        return cached_json(key, {
+            "years": list(range(START_YEAR, START_YEAR + years_to_project + 1)),
+            "target": {"type": target_type, "value": target_value, "year": target_year, "goal": goal},
+            "bounds": {
+                name: list(axis) for name, axis in zip(("gdpGrowth", "lifeGrowth", "urbanGrowth"), bounds)
+            },
+            "solutions": solved["solutions"],
+            "search": {
+                "evaluated": solved["evaluated"],
+                "resolution": resolution,
+                "refinements": refinements
+            }
+        })
+
+    except (ValueError, TypeError, KeyError) as e:
+        logger.error(f"Value error in solve_scenario: {e}")
+        return jsonify({"error": "Invalid numeric values provided"}), 400
+    except Exception as e:
+        logger.error(f"Error solving scenario: {e}")
+        return jsonify({"error": "Scenario search failed"}), 500
+
+MAX_EXPORT_SCENARIOS = 10
+MAX_EXPORT_YEARS = 1000
+
+@app.route("/exports", methods=["POST"])
+def create_export():
+    """Starts a bulk report: a pyramid and a scenario projection page per country"""
+    try:
+        data = request.get_json()
+        if not data:
+            return jsonify({"error": "No data provided"}), 400
+
+        export_format = str(data.get("format", "pdf")).lower()
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"Unsupported format '{export_format}'"}), 400
+        dpi = int(data.get("dpi", 100))
+        if not 50 <= dpi <= 300:
+            return jsonify({"error": "dpi must be between 50 and 300"}), 400
+        years_to_project = int(data.get("yearsToProject", 75))
+        if not 1 <= years_to_project <= MAX_EXPORT_YEARS:
+            return jsonify({"error": f"yearsToProject must be between 1 and {MAX_EXPORT_YEARS}"}), 400
+
+        scenarios = data.get("scenarios") or DEFAULT_SCENARIOS
+        if not isinstance(scenarios, (list, tuple)) or not all(isinstance(s, dict) for s in scenarios):
+            return jsonify({"error": "scenarios must be a list of objects"}), 400
+        if not 1 <= len(scenarios) <= MAX_EXPORT_SCENARIOS:
+            return jsonify({"error": f"Between 1 and {MAX_EXPORT_SCENARIOS} scenarios can be exported"}), 400
+        labels = [str(s.get("label", f"Scenario {i + 1}")) for i, s in enumerate(scenarios)]
+        scenario_matrix = np.array(
+            [[float(s["gdpGrowth"]), float(s["lifeGrowth"]), float(s["urbanGrowth"])] for s in scenarios]
+        )
+
+        try:
+            profiles, (birth, death, migration) = country_baselines(data.get("countries", "all"))
+        except KeyError as e:
+            return jsonify({"error": str(e.args[0])}), 404
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        models = model_registry.get_models()
+        if models is None:
+            return jsonify({"error": "AI models not available"}), 500
+
+        # Every country under every scenario in one pass; only the drawing is fanned out
+        with metrics.timed("export_projection"):
+            projections = scenario_projections(
+                models, profiles["population"], birth, death, migration, scenario_matrix, years_to_project
+            )
+
+        job = export_manager.submit(
+            profiles["country"].tolist(), profiles["male_pyramid_data"], profiles["female_pyramid_data"],
+            list(range(START_YEAR, START_YEAR + years_to_project + 1)), projections, labels,
+            export_format, dpi
+        )
+        if job is None:
+            response = jsonify({"error": "Too many exports in progress, try again later"})
+            response.status_code = 503
+            response.headers["Retry-After"] = "30"
+            return response
+
+        response = jsonify({**job.status(), "status_url": f"/exports/{job.id}"})
+        response.status_code = 202
+        response.headers["Location"] = f"/exports/{job.id}"
+        return response
+
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        logger.error(f"Value error in create_export: {e}")
+        return jsonify({"error": "Invalid export request"}), 400
+    except Exception as e:
+        logger.error(f"Error starting export: {e}")
+        return jsonify({"error": "Export failed to start"}), 500
+
+@app.route("/exports/<job_id>")
+def export_status(job_id):
+    """Progress of an export job"""
+    job = export_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Export not found"}), 404
+    status = job.status()
+    if job.state == "done":
+        status["download_url"] = f"/exports/{job.id}/download"
+    return jsonify(status)
+
+@app.route("/exports/<job_id>/download")
+def export_download(job_id):
+    """The finished report file"""
+    job = export_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Export not found"}), 404
+    if job.state != "done":
+        return jsonify({"error": f"Export is {job.state}", "state": job.state}), 409
+    if not os.path.exists(job.path):
+        return jsonify({"error": "Export has expired"}), 404
+    return send_file(
+        os.path.abspath(job.path), mimetype=EXPORT_FORMATS[job.format],
+        as_attachment=True, download_name=f"population_report.{job.format}"
+    )
+
 @app.route("/health")
 def health_check():
     """Health check endpoint"""
+    # Reports whether the models can be served without forcing them to load
+    available = model_registry.available()
     models_status = {
-        "birth_model": birth_model is not None,
-        "death_model": death_model is not None,
-        "migration_model": migration_model is not None
+        "birth_model": available,
+        "death_model": available,
+        "migration_model": available
     }
     
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "models": models_status
+        "models": models_status,
+        "model_registry": model_registry.status(),
+        "rate_cache": model_registry.rate_cache.stats(),
+        "chart_cache": chart_cache.stats(),
+        "response_cache": response_cache.stats(),
+        "worker_pool": worker_pool.stats() if worker_pool is not None else None
     })
 
+@app.route("/metrics")
+def metrics_endpoint():
+    """Latency histograms, phase timers and cache counters in the Prometheus text format"""
+    extra = []
+    for name, cache in (("rate_change", model_registry.rate_cache), ("chart", chart_cache), ("response", response_cache)):
+        stats = cache.stats()
+        extra += metrics.format_samples(
+            f"app_{name}_cache_requests_total", "counter", f"Lookups in the {name} cache by result",
+            [({"result": "hit"}, stats["hits"]), ({"result": "miss"}, stats["misses"])]
+        )
+        extra += metrics.format_samples(
+            f"app_{name}_cache_entries", "gauge", f"Entries held in the {name} cache", [({}, stats["size"])]
+        )
+    extra += metrics.format_samples(
+        "app_response_cache_disk_hits_total", "counter", "Response cache hits served from the shared SQLite file",
+        [({}, response_cache.stats()["disk_hits"])]
+    )
+    if worker_pool is not None:
+        stats = worker_pool.stats()
+        extra += metrics.format_samples(
+            "app_worker_pool_in_flight", "gauge", "Requests holding a worker pool slot", [({}, stats["in_flight"])]
+        )
+        extra += metrics.format_samples(
+            "app_worker_pool_rejected_total", "counter", "Requests refused with 503", [({}, stats["rejected"])]
+        )
+    return Response(metrics.render(extra), mimetype="text/plain; version=0.0.4")
+
+WARMUP_SCENARIO = {**DEFAULT_SCENARIO, "yearsToProject": 75}
+
+def warm_response_cache():
+    """Precomputes each preset country's default-slider projection, as the page streams it and as plain JSON"""
+    started = time.perf_counter()
+    warmed = 0
+    for row in np.flatnonzero(COUNTRY_STORE.has_profile):
+        name = COUNTRY_STORE.names[row]
+        COUNTRY_STORE.response_json(name)  # /get-country-data bodies are serialized once per country
+        profile = COUNTRY_STORE.response_payload(row)
+        rates = (profile["birth_rate"], profile["death_rate"], profile["migration_rate"])
+        if None in rates:
+            continue
+        projection = {"population": profile["population"], "birthRate": rates[0], "deathRate": rates[1],
+                      "migrationRate": rates[2], **WARMUP_SCENARIO}
+        pending = [("/project_population", project_population, projection),
+                   ("/project_population/stream", project_population_stream, projection)]
+        for path, view, payload in pending:
+            try:
+                with app.test_request_context(path, method="POST", json=payload):
+                    g.skip_admission = True  # warm-up is not a client request and must not hold slots
+                    response = view()
+                    if isinstance(response, Response) and response.is_streamed:
+                        for _ in response.iter_encoded():  # a stream is cached once read to the end
+                            pass
+                warmed += 1
+            except Exception as e:
+                logger.warning(f"Response cache warm-up failed for {name} {path}: {e}")
+    logger.info(f"Response cache warmed with {warmed} preset responses in {time.perf_counter() - started:.2f} s")
+
+if os.environ.get("RESPONSE_CACHE_WARMUP", "0") == "1":
+    # In the background, so startup is not held up by the first model load
+    threading.Thread(target=warm_response_cache, name="response-cache-warmup", daemon=True).start()
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
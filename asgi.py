@@ -0,0 +1,23 @@
+"""Optional async serving mode.
+
+Serves the same Flask routes from an ASGI server:
+
+    pip install a2wsgi uvicorn
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+The event loop accepts connections and hands each request to a thread pool
+(ASGI_THREADS, default 32).  Chart drawing and model evaluation run in a
+process pool of WORKER_POOL_SIZE processes (default: one per core) with
+WORKER_POOL_QUEUE extra admission slots; once those are all taken, heavy
+routes answer 503 with Retry-After while /get-country-data, /health and
+the other cheap routes keep being served from the threads.
+"""
+import os
+
+os.environ.setdefault("WORKER_POOL_SIZE", str(os.cpu_count() or 1))
+
+from a2wsgi import WSGIMiddleware
+
+from app import app
+
+application = WSGIMiddleware(app, workers=int(os.environ.get("ASGI_THREADS", "32")))
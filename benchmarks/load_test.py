@@ -0,0 +1,183 @@
+"""Concurrent mixed-traffic load test reporting p50/p99 latency per route.
+
+Starts the app in the chosen serving mode, drives it with a fixed number of
+client threads sending a weighted mix of cheap and heavy requests, and
+prints latency percentiles and status counts.  Run from the repository root:
+
+    python benchmarks/load_test.py --serve wsgi
+    python benchmarks/load_test.py --serve asgi      # needs a2wsgi and uvicorn
+    python benchmarks/load_test.py --url http://127.0.0.1:8000   # an already running server
+
+wsgi is Flask's threaded development server; asgi is asgi.py under uvicorn
+with the worker process pool.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BACKOFF_SECONDS = 0.1  # pause after a 503 instead of retrying immediately
+
+PRESETS = ["italy", "qatar", "ecuador", "afghanistan", "china", "india", "usa"]
+
+
+def random_pyramid(rng):
+    """An 11-bracket pyramid that will not be in the chart cache"""
+    values = rng.uniform(0.1, 6.0, 22)
+    values *= 100 / values.sum()
+    return values[:11].round(3).tolist(), values[11:].round(3).tolist()
+
+
+# (name, weight, request builder returning (method, path, body))
+TRAFFIC = [
+    ("get-country-data", 40, lambda rng: ("GET", f"/get-country-data/{rng.choice(PRESETS)}", None)),
+    ("health", 10, lambda rng: ("GET", "/health", None)),
+    ("project_population", 25, lambda rng: ("POST", "/project_population", {
+        "population": 1e6, "birthRate": 12, "deathRate": 9, "migrationRate": 1,
+        "gdpGrowth": round(rng.uniform(-5, 8), 2), "lifeGrowth": round(rng.uniform(0, 3), 2),
+        "urbanGrowth": round(rng.uniform(0, 3), 2),
+    })),
+    ("generate-chart", 25, lambda rng: ("POST", "/generate-chart", dict(
+        zip(("male", "female"), random_pyramid(rng))
+    ))),
+]
+
+SERVERS = {
+    "wsgi": [sys.executable, "-c", "from app import app; app.run(host='127.0.0.1', port={port}, threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:application", "--host", "127.0.0.1", "--port", "{port}",
+             "--log-level", "warning"],
+}
+
+
+def start_server(mode, port):
+    command = [part.format(port=port) for part in SERVERS[mode]]
+    # Own process group, so stopping it also stops the worker pool's processes
+    process = subprocess.Popen(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"{mode} server did not start on port {port}")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+
+def client(url, deadline, seed, results, lock):
+    parsed = urlparse(url)
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    names = [name for name, _, _ in TRAFFIC]
+    weights = [weight for _, weight, _ in TRAFFIC]
+    builders = {name: build for name, _, build in TRAFFIC}
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+    local = []
+    while time.time() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path, body = builders[name](np_rng if name == "generate-chart" else rng)
+        payload = None if body is None else json.dumps(body)
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, payload, headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = "error"
+            connection.close()
+            connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        local.append((name, status, time.perf_counter() - start))
+        if status == 503:
+            time.sleep(BACKOFF_SECONDS)
+    with lock:
+        results.extend(local)
+
+
+def run(url, concurrency, duration, seed=0):
+    results = []
+    lock = threading.Lock()
+    deadline = time.time() + duration
+    threads = [
+        threading.Thread(target=client, args=(url, deadline, seed + i, results, lock))
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(results, duration)
+
+
+def summarize(results, duration):
+    summary = {}
+    for name in [name for name, _, _ in TRAFFIC] + ["all"]:
+        rows = [r for r in results if name in ("all", r[0])]
+        if not rows:
+            continue
+        ok = np.array([latency for _, status, latency in rows if status == 200])
+        statuses = {}
+        for _, status, _ in rows:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[name] = {
+            "requests": len(rows),
+            "throughput_rps": len(rows) / duration,
+            "p50_ms": float(np.percentile(ok, 50) * 1000) if len(ok) else None,
+            "p99_ms": float(np.percentile(ok, 99) * 1000) if len(ok) else None,
+            "statuses": statuses,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--serve", choices=sorted(SERVERS), help="start the app in this mode")
+    parser.add_argument("--url", default=None, help="target an already running server instead")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--output", help="write the summary as JSON to this path")
+    args = parser.parse_args()
+
+    if not args.serve and not args.url:
+        parser.error("give --serve or --url")
+    process = start_server(args.serve, args.port) if args.serve else None
+    url = args.url or f"http://127.0.0.1:{args.port}"
+    try:
+        summary = run(url, args.concurrency, args.duration)
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    print(f"{'route':20s} {'requests':>9s} {'req/s':>8s} {'p50 ms':>9s} {'p99 ms':>9s}  statuses")
+    for name, stats in summary.items():
+        p50 = "-" if stats["p50_ms"] is None else f"{stats['p50_ms']:9.1f}"
+        p99 = "-" if stats["p99_ms"] is None else f"{stats['p99_ms']:9.1f}"
+        print(f"{name:20s} {stats['requests']:9d} {stats['throughput_rps']:8.1f} {p50:>9s} {p99:>9s}  {stats['statuses']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"mode": args.serve or url, "concurrency": args.concurrency, "results": summary}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
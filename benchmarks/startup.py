@@ -0,0 +1,100 @@
+"""Measures app import time, first-prediction latency and per-process memory.
+
+Each configuration runs in a fresh interpreter so nothing is shared with
+this process.  Run from the repository root:
+
+    python benchmarks/startup.py
+
+Configurations compare memory-mapped compiled forests, compiled forests
+read into private memory, and the original sklearn pickles.
+"""
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIGURATIONS = {
+    "compiled (mmap)": {"MODEL_MMAP": "1"},
+    "compiled (in memory)": {"MODEL_MMAP": "0"},
+    "pickle": {"COMPILED_MODELS_DIR": "__no_compiled_models__"},
+}
+
+# Runs inside the child interpreter and prints one JSON line
+PROBE = r"""
+import json, time
+start = time.perf_counter()
+import app
+import_time = time.perf_counter() - start
+
+def memory():
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if parts[0] in ("Rss:", "Pss:", "Shared_Clean:", "Private_Dirty:"):
+                    fields[parts[0][:-1].lower()] = int(parts[1]) / 1024
+    except OSError:
+        import resource
+        fields["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return fields
+
+after_import = memory()
+client = app.app.test_client()
+start = time.perf_counter()
+response = client.post("/project_population", json={"population": 1000000})
+first_request = time.perf_counter() - start
+assert response.status_code == 200, response.get_json()
+start = time.perf_counter()
+client.post("/project_population", json={"population": 1000000, "gdpGrowth": 3.0})
+second_request = time.perf_counter() - start
+
+def peak_rss():
+    # VmHWM is per address space; ru_maxrss would carry the parent's peak across exec
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps({
+    "import_s": import_time,
+    "first_projection_s": first_request,
+    "second_projection_s": second_request,
+    "memory_after_import_mb": after_import,
+    "memory_after_load_mb": memory(),
+    "peak_rss_mb": peak_rss(),
+}))
+"""
+
+
+def measure(env_overrides):
+    env = dict(os.environ, **env_overrides)
+    env["PYTHONWARNINGS"] = "ignore"
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=REPO_ROOT, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run():
+    return {name: measure(overrides) for name, overrides in CONFIGURATIONS.items()}
+
+
+if __name__ == "__main__":
+    results = run()
+    for name, stats in results.items():
+        memory = stats["memory_after_load_mb"]
+        print(f"{name:22s} import {stats['import_s'] * 1000:7.1f} ms | "
+              f"first projection {stats['first_projection_s'] * 1000:7.1f} ms | "
+              f"RSS {memory.get('rss', 0):6.1f} MB, PSS {memory.get('pss', 0):6.1f} MB, "
+              f"shared clean {memory.get('shared_clean', 0):6.1f} MB")
+    if "--json" in sys.argv:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,369 @@
+"""Reproducible benchmark suite for inference, projection, charts and startup.
+
+Run from the repository root:
+
+    python benchmarks/suite.py                       # everything
+    python benchmarks/suite.py -k predict -k chart   # benchmarks whose name contains any of these
+    python benchmarks/suite.py --compare benchmarks/results/OLD.json benchmarks/results/NEW.json
+
+Each run is saved to benchmarks/results/<timestamp>-<commit>.json with the
+machine, Python/NumPy versions and the git commit, so runs made on the same
+machine at different commits can be compared with --compare.
+
+Every timed case is calibrated to run at least --min-time seconds per
+round, repeated --rounds times; the median round is the headline number.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Registers a setup function returning the callable to time"""
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def measure(fn, min_time=0.2, rounds=5):
+    """Times fn: calibrates a loop count so one round takes min_time, then repeats rounds"""
+    fn()  # warm-up: imports, lazy loads, first-call caches
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0,
+        "ops_per_s": 1.0 / statistics.median(times),
+        "loops": number,
+        "rounds": rounds,
+    }
+
+
+def _client():
+    import app
+    return app.app.test_client()
+
+
+def _pickled_models():
+    import joblib
+    return tuple(joblib.load(f"{name}.pkl") for name in ("birth_model", "death_model", "migration_model"))
+
+
+def _compiled_models():
+    from compiled_forest import load_compiled_models
+    return load_compiled_models(mmap_mode="r")
+
+
+def _scenarios(n, seed=0):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(-10, 15, n), rng.uniform(-5, 10, n), rng.uniform(-5, 10, n)])
+
+
+@benchmark("predict.pickle.single")
+def bench_predict_pickle_single():
+    from projection_engine import predict_rate_changes
+    models = _pickled_models()
+    return lambda: predict_rate_changes(models, 2.0, 1.0, 1.0)
+
+
+@benchmark("predict.pickle.batch_1000")
+def bench_predict_pickle_batch():
+    from projection_engine import predict_rate_changes_batch
+    models, X = _pickled_models(), _scenarios(1000)
+    return lambda: predict_rate_changes_batch(models, X)
+
+
+@benchmark("predict.compiled.single")
+def bench_predict_compiled_single():
+    from projection_engine import predict_rate_changes
+    models = _compiled_models()
+    return lambda: predict_rate_changes(models, 2.0, 1.0, 1.0)
+
+
+@benchmark("predict.compiled.batch_1000")
+def bench_predict_compiled_batch():
+    from projection_engine import predict_rate_changes_batch
+    models, X = _compiled_models(), _scenarios(1000)
+    return lambda: predict_rate_changes_batch(models, X)
+
+
+@benchmark("predict_route.single")
+def bench_predict_route_single():
+    client = _client()
+    body = {"gdp": 2.0, "life": 1.0, "urban": 1.0}
+    return lambda: client.post("/predict", json=body)
+
+
+@benchmark("predict_route.batch_1000")
+def bench_predict_route_batch():
+    client = _client()
+    X = _scenarios(1000)
+    body = {"gdp": X[:, 0].tolist(), "life": X[:, 1].tolist(), "urban": X[:, 2].tolist()}
+    return lambda: client.post("/predict", json=body)
+
+
+def _projection_case(years, cached):
+    client = _client()
+    body = {"population": 5.9e7, "birthRate": 6.7, "deathRate": 12.1, "migrationRate": 2.5,
+            "gdpGrowth": 2.0, "lifeGrowth": 1.0, "urbanGrowth": 1.0, "yearsToProject": years}
+    counter = iter(range(10 ** 9))
+
+    def run():
+        if not cached:
+            # A new growth triple every call, so the rate-change cache always misses
+            body["gdpGrowth"] = 2.0 + next(counter) * 1e-9
+        response = client.post("/project_population", json=body)
+        assert response.status_code == 200, response.get_json()
+    return run
+
+
+@benchmark("project_population.75y.cached")
+def bench_projection_75_cached():
+    return _projection_case(75, cached=True)
+
+
+@benchmark("project_population.75y.uncached")
+def bench_projection_75_uncached():
+    return _projection_case(75, cached=False)
+
+
+@benchmark("project_population.500y.cached")
+def bench_projection_500_cached():
+    return _projection_case(500, cached=True)
+
+
+@benchmark("project_population.500y.uncached")
+def bench_projection_500_uncached():
+    return _projection_case(500, cached=False)
+
+
+@benchmark("solve_scenario.year_target")
+def bench_solve_scenario():
+    client = _client()
+    body = {"country": "italy", "target": {"type": "year", "year": 2100, "value": 5e7, "goal": "at_least"}}
+    counter = iter(range(10 ** 9))
+
+    def run():
+        # A new target every call, so the response cache always misses
+        body["target"]["value"] = 5e7 + next(counter)
+        response = client.post("/solve_scenario", json=body)
+        assert response.status_code == 200, response.get_json()
+    return run
+
+
+def _chart_case(warm):
+    import numpy as np
+    from charts import chart_cache
+    client = _client()
+    rng = np.random.default_rng(0)
+    fixed = {"male": [4.0] * 11, "female": [5.0] * 11}
+
+    def run():
+        if warm:
+            body = fixed
+        else:
+            # Fresh data each call: a cache miss that has to draw and encode
+            values = rng.uniform(0.1, 6.0, 22).round(4)
+            body = {"male": values[:11].tolist(), "female": values[11:].tolist()}
+        response = client.post("/generate-chart", json=body)
+        assert response.status_code == 200, response.get_json()
+    chart_cache.clear()
+    return run
+
+
+@benchmark("generate_chart.cold")
+def bench_chart_cold():
+    return _chart_case(warm=False)
+
+
+@benchmark("generate_chart.warm")
+def bench_chart_warm():
+    return _chart_case(warm=True)
+
+
+@benchmark("get_country_data")
+def bench_get_country_data():
+    client = _client()
+    countries = ["italy", "qatar", "ecuador", "afghanistan", "china", "india"]
+    counter = iter(range(10 ** 9))
+
+    def run():
+        response = client.get(f"/get-country-data/{countries[next(counter) % len(countries)]}")
+        assert response.status_code == 200
+    return run
+
+
+def _export_case(processes):
+    import tempfile
+    import numpy as np
+    from report_export import DEFAULT_SCENARIOS, ExportManager, scenario_projections
+    from app import COUNTRY_STORE, model_registry
+
+    # The preset countries four times over: 56 pages, enough to keep every worker busy
+    rows = np.tile(COUNTRY_STORE.rows("all"), 4)
+    profiles = COUNTRY_STORE.profiles(rows)
+    scenarios = np.array([[s["gdpGrowth"], s["lifeGrowth"], s["urbanGrowth"]] for s in DEFAULT_SCENARIOS])
+    projections = scenario_projections(
+        model_registry.get_models(), profiles["population"],
+        np.nan_to_num(profiles["birth_rate"], nan=20.0) / 1000,
+        np.nan_to_num(profiles["death_rate"], nan=10.0) / 1000,
+        np.nan_to_num(profiles["migration_rate"], nan=0.0) / 1000,
+        scenarios, 75
+    )
+    years = list(range(2025, 2101))
+    labels = [s["label"] for s in DEFAULT_SCENARIOS]
+    manager = ExportManager(tempfile.mkdtemp(prefix="bench-exports-"), processes=processes)
+
+    def run():
+        job = manager.submit(profiles["country"].tolist(), profiles["male_pyramid_data"],
+                             profiles["female_pyramid_data"], years, projections, labels, "pdf", 100)
+        while job.finished is None:
+            time.sleep(0.01)
+        assert job.state == "done", job.error
+        os.remove(job.path)
+    return run
+
+
+@benchmark("exports.pdf.1_process")
+def bench_exports_one_process():
+    return _export_case(1)
+
+
+@benchmark("exports.pdf.all_cores")
+def bench_exports_all_cores():
+    # Compared with exports.pdf.1_process, shows how page rendering scales with EXPORT_PROCESSES
+    return _export_case(os.cpu_count())
+
+
+def run_startup():
+    """Import time, first projection and memory per model configuration, each in a fresh interpreter"""
+    import startup
+    results = {}
+    for name, stats in startup.run().items():
+        memory = stats["memory_after_load_mb"]
+        results[f"startup.{name}"] = {
+            "import_s": stats["import_s"],
+            "first_projection_s": stats["first_projection_s"],
+            "rss_mb": memory.get("rss"),
+            "pss_mb": memory.get("pss"),
+            "peak_rss_mb": stats.get("peak_rss_mb"),
+        }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment():
+    import numpy as np
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "system": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{'benchmark':40s} {old['environment']['commit']:>12s} {new['environment']['commit']:>12s} {'change':>8s}")
+    for name, stats in new["results"].items():
+        before = old["results"].get(name)
+        key = "median_s" if "median_s" in stats else "import_s"
+        if before is None or key not in before:
+            continue
+        change = stats[key] / before[key] - 1
+        flag = "  slower" if change > 0.1 else "  faster" if change < -0.1 else ""
+        print(f"{name:40s} {before[key] * 1000:10.3f}ms {stats[key] * 1000:10.3f}ms {change:+8.1%}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-k", action="append", default=[], help="only benchmarks whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-startup", action="store_true", help="skip the subprocess startup measurements")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two saved result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    os.chdir(REPO_ROOT)
+    import logging
+    import warnings
+    logging.disable(logging.WARNING)
+    # The pickled forests were fitted on a DataFrame; plain arrays are what the app passes
+    warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+    results = {}
+    for name, setup in BENCHMARKS:
+        if args.k and not any(pattern in name for pattern in args.k):
+            continue
+        results[name] = stats = measure(setup(), args.min_time, args.rounds)
+        print(f"{name:40s} {stats['median_s'] * 1000:10.3f} ms  ±{stats['stdev_s'] * 1000:8.3f}  "
+              f"{stats['ops_per_s']:10.1f} ops/s")
+
+    if not args.no_startup and (not args.k or any(pattern in "startup" for pattern in args.k)):
+        for name, stats in run_startup().items():
+            results[name] = stats
+            print(f"{name:40s} import {stats['import_s'] * 1000:8.1f} ms  first projection "
+                  f"{stats['first_projection_s'] * 1000:8.1f} ms  peak RSS {stats['peak_rss_mb'] or 0:6.1f} MB")
+
+    environment_info = environment()
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{environment_info['commit']}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"environment": environment_info, "created": datetime.now().isoformat(), "results": results},
+                  f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""Population pyramid rendering for /generate-chart.
+
+Charts are drawn with matplotlib's object-oriented Figure/Agg API rather than
+the global pyplot state machine, so rendering is safe under a threaded
+server.  Template figures are borrowed from a small pool (the server starts
+a thread per request, so per-thread figures would never be reused) and only
+the bar widths and labels are updated per request, and finished images are kept in a
+content-addressed cache keyed by the normalized input arrays and the render
+options, so repeated pyramids (the preset countries) cost a dictionary lookup.
+"""
+import hashlib
+import io
+import json
+import queue
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import timed
+
+AGE_BRACKETS = [
+    "0-9", "10-19", "20-29", "30-39", "40-49",
+    "50-59", "60-69", "70-79", "80-89", "90-99", "100+"
+]
+
+CHART_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+DEFAULT_DPI = 150
+LABEL_THRESHOLD = 0.5  # only label bars wider than this many percent
+CHART_STYLE = 1  # bump when the pyramid's look changes, to retire stored charts
+
+
+def chart_version():
+    """The chart style revision plus the matplotlib release, for keying stored chart images"""
+    from importlib.metadata import version
+
+    return f"{CHART_STYLE}-{version('matplotlib')}"
+
+
+def normalize_pyramid(male, female):
+    """Returns the male/female percentages as two float64 arrays of AGE_BRACKETS length"""
+    male = np.abs(np.asarray(male, dtype=np.float64))
+    female = np.asarray(female, dtype=np.float64)
+    if male.shape != (len(AGE_BRACKETS),) or female.shape != (len(AGE_BRACKETS),):
+        raise ValueError("Pyramid data must have one value per age bracket")
+    if not (np.isfinite(male).all() and np.isfinite(female).all()):
+        raise ValueError("Pyramid data must be finite numbers")
+    return male, female
+
+
+def chart_key(male, female, fmt="png", dpi=DEFAULT_DPI):
+    """Content hash of the normalized pyramid plus render options"""
+    digest = hashlib.sha256()
+    digest.update(np.round(male, 6).tobytes())
+    digest.update(np.round(female, 6).tobytes())
+    digest.update(json.dumps({"format": fmt, "dpi": dpi}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class ChartCache:
+    """Bounded LRU cache of rendered chart bytes keyed by chart_key"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, image):
+        with self._lock:
+            self._entries[key] = image
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": sum(len(image) for image in self._entries.values()),
+            }
+
+
+class PyramidTemplate:
+    """A reusable pyramid figure; render() only touches bar widths and labels"""
+
+    def __init__(self, title='Population Pyramid'):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        self.figure = Figure(figsize=(10, 8))
+        self.canvas = FigureCanvasAgg(self.figure)
+        ax = self.figure.add_subplot()
+        self.ax = ax
+        y_pos = list(range(len(AGE_BRACKETS)))
+
+        zeros = [0.0] * len(AGE_BRACKETS)
+        self.male_bars = ax.barh(y_pos, zeros, color='#2196F3', label='Male', alpha=0.8)
+        self.female_bars = ax.barh(y_pos, zeros, color='#E91E63', label='Female', alpha=0.8)
+
+        ax.set_yticks(y_pos)
+        ax.set_yticklabels(AGE_BRACKETS)
+        ax.set_xlabel('Population %', fontsize=12, fontweight='bold')
+        ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+        ax.legend(loc='upper right')
+        ax.grid(axis='x', linestyle='--', alpha=0.7)
+        ax.axvline(x=0, color='black', linewidth=0.8)
+
+        label_style = dict(ha='center', va='center', fontsize=8, color='white', fontweight='bold')
+        self.male_labels = [ax.text(0, i, '', **label_style) for i in y_pos]
+        self.female_labels = [ax.text(0, i, '', **label_style) for i in y_pos]
+
+        # Lay the figure out once; tick label widths barely change between pyramids
+        self.update(np.ones(len(AGE_BRACKETS)), np.ones(len(AGE_BRACKETS)))
+        self.figure.tight_layout()
+
+    def update(self, male, female):
+        for bar, label, value in zip(self.male_bars, self.male_labels, male):
+            bar.set_width(-value)
+            label.set_position((-value / 2, label.get_position()[1]))
+            label.set_text(f'{value:.1f}%')
+            label.set_visible(value > LABEL_THRESHOLD)
+        for bar, label, value in zip(self.female_bars, self.female_labels, female):
+            bar.set_width(value)
+            label.set_position((value / 2, label.get_position()[1]))
+            label.set_text(f'{value:.1f}%')
+            label.set_visible(value > LABEL_THRESHOLD)
+
+        # Same automatic x-limits barh would pick: data range plus default margins
+        low = -max(male.max(), 0.0)
+        high = max(female.max(), 0.0)
+        if low == high:
+            low, high = -1.0, 1.0
+        margin = (high - low) * self.ax.margins()[0]
+        self.ax.set_xlim(low - margin, high + margin)
+
+    def render(self, male, female, fmt="png", dpi=DEFAULT_DPI):
+        with timed("chart_draw"):
+            self.update(male, female)
+        buf = io.BytesIO()
+        # Rasterizing and encoding both happen inside savefig
+        with timed("savefig"):
+            self.figure.savefig(buf, format=fmt, dpi=dpi)
+        return buf.getvalue()
+
+
+TEMPLATE_POOL_SIZE = 4  # idle templates kept; concurrent renders beyond this build throwaway figures
+
+_templates = queue.LifoQueue(maxsize=TEMPLATE_POOL_SIZE)
+
+
+def _render_on_template(male, female, fmt, dpi):
+    """Borrows an idle template (or builds one) for a single render and returns it to the pool"""
+    try:
+        template = _templates.get_nowait()
+    except queue.Empty:
+        template = PyramidTemplate()
+    try:
+        return template.render(male, female, fmt, dpi)
+    finally:
+        try:
+            _templates.put_nowait(template)
+        except queue.Full:
+            pass
+
+
+def pyramid_figure(male, female, title='Population Pyramid'):
+    """A new (figure, canvas) with the pyramid drawn under title, for callers that finish the figure themselves"""
+    template = PyramidTemplate(title)
+    template.update(*normalize_pyramid(male, female))
+    return template.figure, template.canvas
+
+
+def draw_pyramid(male, female, fmt="png", dpi=DEFAULT_DPI):
+    """Draws normalized pyramid data on a pooled template and returns the image bytes"""
+    return _render_on_template(male, female, fmt, dpi)
+
+
+chart_cache = ChartCache()
+
+
+def render_pyramid(male, female, fmt="png", dpi=DEFAULT_DPI, cache=chart_cache, render=None):
+    """Renders a pyramid chart and returns (key, image bytes).
+
+    male and female are percentages per age bracket (male values may be given
+    as positive or negative).  fmt is "png" or "svg"; SVG output is vector
+    only and skips rasterization entirely.  render replaces draw_pyramid for
+    cache misses, e.g. to draw in a worker process.
+    """
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format '{fmt}'")
+    male, female = normalize_pyramid(male, female)
+    key = chart_key(male, female, fmt, dpi)
+
+    image = cache.get(key) if cache is not None else None
+    if image is None:
+        image = (render or draw_pyramid)(male, female, fmt, dpi)
+        if cache is not None:
+            cache.put(key, image)
+    return key, image
@@ -0,0 +1,121 @@
+"""Cohort-component projection over the 11 ten-year age brackets.
+
+The population is held as a [scenarios, sex, bracket] array of head counts
+and advanced one year at a time with whole-array operations:
+
+1. age-specific mortality, scaled so the crude death rate of the starting
+   pyramid matches the scenario's death rate path,
+2. births from women of reproductive age, scaled the same way against the
+   birth rate path and split by sex into the 0-9 bracket,
+3. a Leslie-style ageing step: a tenth of every bracket moves up one
+   bracket each year (the last bracket is open-ended),
+4. net migration distributed over a working-age profile.
+
+The birth, death and migration rate paths come from the same AI-predicted
+rate changes and bounds as projection_engine.project_scenarios.
+"""
+import numpy as np
+
+from projection_engine import MAX_POPULATION_MULTIPLE, MIN_POPULATION
+
+N_BRACKETS = 11
+MALE, FEMALE = 0, 1
+
+# Relative mortality by bracket (same shape the frontend's local aging model uses)
+MORTALITY_PROFILE = np.array([0.1, 0.2, 0.3, 0.5, 0.8, 1.2, 2.0, 3.5, 6.0, 10.0, 15.0])
+FEMALE_MORTALITY_FACTOR = 0.8  # women live longer
+
+# Share of births by the mother's bracket (10-19 through 40-49)
+FERTILITY_PROFILE = np.array([0.0, 0.1, 0.5, 0.35, 0.05, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+MALE_BIRTH_SHARE = 0.51
+
+# Net migrants by bracket, split evenly between the sexes
+MIGRATION_PROFILE = np.array([0.15, 0.15, 0.3, 0.2, 0.1, 0.05, 0.03, 0.01, 0.01, 0.0, 0.0])
+MIGRATION_PROFILE = MIGRATION_PROFILE / MIGRATION_PROFILE.sum()
+
+BRACKET_WIDTH = 10  # years per bracket
+
+
+def ageing_matrix(width=BRACKET_WIDTH):
+    """One-year transition between brackets: stay with 1 - 1/width, move up with 1/width"""
+    A = np.diag(np.full(N_BRACKETS, 1.0 - 1.0 / width))
+    A[np.arange(N_BRACKETS - 1), np.arange(1, N_BRACKETS)] = 1.0 / width
+    A[-1, -1] = 1.0
+    return A
+
+
+AGEING = ageing_matrix()
+SEX_MORTALITY = np.array([1.0, FEMALE_MORTALITY_FACTOR])[:, None] * MORTALITY_PROFILE  # (2, 11)
+
+
+def initial_cohorts(population, male_pct, female_pct):
+    """Head counts [scenarios, sex, bracket] from totals and pyramid percentages"""
+    population = np.asarray(population, dtype=float).reshape(-1)
+    pct = np.stack([np.asarray(male_pct, dtype=float), np.asarray(female_pct, dtype=float)], axis=-2)
+    pct = np.broadcast_to(pct, (population.size, 2, N_BRACKETS))
+    shares = pct / np.maximum(pct.sum(axis=(1, 2), keepdims=True), 1e-12)
+    return population[:, None, None] * shares
+
+
+def iter_cohorts(cohorts, rates):
+    """Advances cohorts one year per item of rates, yielding the head counts after each year.
+
+    cohorts is [S, 2, 11] and rates yields the (birth, death, migration)
+    length-S arrays of crude rates for years 1, 2, ... as produced by
+    projection_engine.iter_scenarios.
+    """
+    cohorts = np.asarray(cohorts, dtype=float)
+    totals = cohorts.sum(axis=(1, 2))
+    max_total = totals * MAX_POPULATION_MULTIPLE
+
+    # Calibrate the age schedules so the starting pyramid reproduces the crude rates
+    weighted_deaths = np.einsum("ska,ka->s", cohorts, SEX_MORTALITY)
+    death_scale = totals / np.maximum(weighted_deaths, 1e-12)
+    weighted_mothers = cohorts[:, FEMALE] @ FERTILITY_PROFILE
+    birth_scale = np.where(weighted_mothers > 0, totals / np.maximum(weighted_mothers, 1e-12), 0.0)
+
+    for birth_rate, death_rate, migration_rate in rates:
+        total = cohorts.sum(axis=(1, 2))
+
+        # Mortality: [S, 1, 1] crude-rate scale times the [2, 11] age/sex schedule
+        mortality = (death_rate * death_scale)[:, None, None] * SEX_MORTALITY
+        survivors = cohorts * np.clip(1.0 - mortality, 0.0, 1.0)
+
+        births = (birth_rate * birth_scale) * (cohorts[:, FEMALE] @ FERTILITY_PROFILE)
+
+        # Leslie-style ageing across all scenarios and both sexes at once
+        cohorts = survivors @ AGEING
+        cohorts[:, MALE, 0] += births * MALE_BIRTH_SHARE
+        cohorts[:, FEMALE, 0] += births * (1.0 - MALE_BIRTH_SHARE)
+
+        migrants = (migration_rate * total)[:, None, None] * (0.5 * MIGRATION_PROFILE)
+        cohorts = np.maximum(cohorts + migrants, 0.0)
+
+        # Same population bounds as the total-population recurrence
+        new_total = cohorts.sum(axis=(1, 2))
+        bounded = np.clip(new_total, MIN_POPULATION, max_total)
+        cohorts *= (bounded / np.maximum(new_total, 1e-12))[:, None, None]
+
+        yield cohorts
+
+
+def project_cohorts(cohorts, birth_path, death_path, migration_path):
+    """Advances cohorts through the given crude rate paths.
+
+    cohorts is [S, 2, 11]; each path is a (years + 1) x S array of rates per
+    person per year as returned by project_scenarios(return_rate_paths=True).
+    Returns a (years + 1, S, 2, 11) array of head counts.
+    """
+    cohorts = np.asarray(cohorts, dtype=float)
+    history = np.empty((birth_path.shape[0],) + cohorts.shape)
+    history[0] = cohorts
+    rates = zip(birth_path[1:], death_path[1:], migration_path[1:])
+    for year, step in enumerate(iter_cohorts(cohorts, rates), start=1):
+        history[year] = step
+    return history
+
+
+def pyramid_percentages(history):
+    """Converts head counts (..., 2, 11) into male/female percentages of each total"""
+    totals = history.sum(axis=(-2, -1), keepdims=True)
+    return 100.0 * history / np.maximum(totals, 1e-12)
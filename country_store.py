@@ -0,0 +1,295 @@
+"""Columnar store of country demographics.
+
+All country facts live in NumPy arrays with one row per country: one
+column per indicator, fixed 11-wide male/female pyramid matrices and a
+(country, year, indicator) history cube.  Names resolve to rows through a
+case-folded index that also knows common aliases, and the JSON body served
+by /get-country-data is serialized once per country and reused.
+
+Sources, in order of precedence for the current indicators:
+demographics.json (presets with population and pyramids),
+demographics.csv (2025 snapshot) and demographics_multi_year.csv (history).
+"""
+import csv
+import json
+import logging
+import re
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PYRAMID_WIDTH = 11
+
+INDICATORS = (
+    "gdp_per_capita", "life_expectancy", "urbanization",
+    "birth_rate", "death_rate", "migration_rate", "fertility_rate",
+)
+
+HISTORY_INDICATORS = (
+    "GDP_per_capita", "Life_expectancy", "Urbanization",
+    "Birth_rate", "Death_rate", "Migration_rate",
+)
+
+# Column names used by demographics.csv for the 2025 snapshot
+SNAPSHOT_COLUMNS = {
+    "GDP_per_capita": "gdp_per_capita",
+    "Life_expectancy": "life_expectancy",
+    "Urbanization": "urbanization",
+    "Fertility_rate": "fertility_rate",
+    "Death_rate": "death_rate",
+    "Migration_rate": "migration_rate",
+}
+
+# Alternative spellings mapped to the canonical (case-folded) country name
+COUNTRY_ALIASES = {
+    "usa": "united states",
+    "us": "united states",
+    "u.s.": "united states",
+    "u.s.a.": "united states",
+    "america": "united states",
+    "united states of america": "united states",
+    "uk": "united kingdom",
+    "great britain": "united kingdom",
+    "britain": "united kingdom",
+    "prc": "china",
+    "people's republic of china": "china",
+    "uae": "united arab emirates",
+    "south korea": "korea, south",
+    "republic of korea": "korea, south",
+    "russian federation": "russia",
+    "czechia": "czech republic",
+    "türkiye": "turkey",
+    "turkiye": "turkey",
+    "ivory coast": "cote d'ivoire",
+}
+
+# Defaults the API has always used for missing values
+RESPONSE_DEFAULTS = {
+    "gdp_per_capita": 0,
+    "life_expectancy": 70,
+    "urbanization": 0,
+    "birth_rate": None,
+    "death_rate": None,
+    "migration_rate": None,
+}
+
+
+def fold_name(name):
+    """Case-folds a country name and normalizes separators and spacing"""
+    name = re.sub(r"[_\-]+", " ", str(name)).casefold()
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _json_number(value):
+    """Converts a stored float to a JSON-ready float, with None for missing"""
+    if np.isnan(value):
+        return None
+    return float(value)
+
+
+class CountryStore:
+    """Indexed, columnar country data with cached per-country responses"""
+
+    def __init__(self, names, population, male_pyramids, female_pyramids, indicators,
+                 regions, history_years, history):
+        self.names = np.asarray(names, dtype=str)  # display names, one per row
+        self.population = population  # int64, -1 where unknown
+        self.male_pyramids = male_pyramids  # (n, 11)
+        self.female_pyramids = female_pyramids  # (n, 11)
+        self.indicators = indicators  # name -> float64 column, NaN where unknown
+        self.regions = regions  # region name per row ('' where unknown)
+        self.history_years = history_years  # (n_years,)
+        self.history = history  # (n, n_years, len(HISTORY_INDICATORS)), NaN where unknown
+        self.has_profile = population >= 0
+
+        self.index = {fold_name(name): row for row, name in enumerate(self.names)}
+        for alias, canonical in COUNTRY_ALIASES.items():
+            if canonical in self.index and alias not in self.index:
+                self.index[alias] = self.index[canonical]
+
+        self._responses = {}
+        self._lock = threading.Lock()
+        self.data_version = None  # content hash of the source files (set by data_artifact.load_country_store)
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def load(cls, json_path="demographics.json", snapshot_path="demographics.csv",
+             history_path="demographics_multi_year.csv"):
+        """Builds the store from the JSON presets and the two CSV files"""
+        presets = _read_json(json_path)
+        snapshot = _read_csv(snapshot_path)
+        history_rows = _read_csv(history_path)
+
+        # Row order: presets first (as listed), then every other country seen
+        names = []
+        rows = {}
+
+        def row_for(name):
+            key = fold_name(name)
+            key = COUNTRY_ALIASES.get(key, key)
+            if key not in rows:
+                rows[key] = len(names)
+                names.append(name)
+            return rows[key]
+
+        for key in presets:
+            row_for(key.title() if key.islower() else key)
+        for record in snapshot + history_rows:
+            if record.get("Country"):
+                row_for(record["Country"])
+
+        n = len(names)
+        population = np.full(n, -1, dtype=np.int64)
+        male = np.zeros((n, PYRAMID_WIDTH))
+        female = np.zeros((n, PYRAMID_WIDTH))
+        indicators = {name: np.full(n, np.nan) for name in INDICATORS}
+        regions = np.full(n, "", dtype=object)
+
+        for key, data in presets.items():
+            row = row_for(key)
+            population[row] = int(data.get("population", 0))
+            male[row] = _pyramid(data.get("male_pyramid_data"))
+            female[row] = _pyramid(data.get("female_pyramid_data"))
+            for name in INDICATORS:
+                if data.get(name) is not None:
+                    indicators[name][row] = float(data[name])
+
+        for record in snapshot:
+            row = row_for(record["Country"])
+            for column, name in SNAPSHOT_COLUMNS.items():
+                if np.isnan(indicators[name][row]):
+                    indicators[name][row] = _to_float(record.get(column))
+
+        # History cube; malformed rows (wrong column count) are skipped
+        valid = [r for r in history_rows if _is_complete(r)]
+        if len(valid) != len(history_rows):
+            logger.warning(f"Skipped {len(history_rows) - len(valid)} malformed rows in {history_path}")
+        years = np.array(sorted({int(float(r["Year"])) for r in valid}), dtype=np.int64)
+        history = np.full((n, len(years), len(HISTORY_INDICATORS)), np.nan)
+        if valid:
+            row_idx = np.array([row_for(r["Country"]) for r in valid])
+            year_idx = np.searchsorted(years, [int(float(r["Year"])) for r in valid])
+            values = np.array([[_to_float(r.get(c)) for c in HISTORY_INDICATORS] for r in valid])
+            history[row_idx, year_idx] = values
+            for r, row in zip(valid, row_idx):
+                if r.get("Region") and not regions[row]:
+                    regions[row] = r["Region"]
+
+        return cls(names, population, male, female, indicators, regions.astype(str), years, history)
+
+    def lookup(self, name):
+        """Row index for a country name or alias, or None"""
+        key = fold_name(name)
+        return self.index.get(key, self.index.get(COUNTRY_ALIASES.get(key, key)))
+
+    def rows(self, names):
+        """Row indices for many names; "all" selects every country with a profile"""
+        if names == "all":
+            return np.flatnonzero(self.has_profile)
+        rows = [self.lookup(name) for name in names]
+        missing = [name for name, row in zip(names, rows) if row is None]
+        if missing:
+            raise KeyError(f"Unknown countries: {', '.join(map(str, missing))}")
+        return np.asarray(rows, dtype=np.intp)
+
+    def response_payload(self, row):
+        payload = {
+            "population": int(self.population[row]),
+            "male_pyramid_data": self.male_pyramids[row].tolist(),
+            "female_pyramid_data": self.female_pyramids[row].tolist(),
+        }
+        for name, default in RESPONSE_DEFAULTS.items():
+            value = _json_number(self.indicators[name][row])
+            payload[name] = default if value is None else value
+        return payload
+
+    def response_json(self, name):
+        """Pre-serialized /get-country-data body, or None if the country has no profile"""
+        row = self.lookup(name)
+        if row is None or not self.has_profile[row]:
+            return None
+        body = self._responses.get(row)
+        if body is None:
+            body = (json.dumps(self.response_payload(row), sort_keys=True, separators=(",", ":")) + "\n").encode()
+            with self._lock:
+                self._responses[row] = body
+        return body
+
+    def pyramid(self, name):
+        """(male, female) percentage arrays for a country, or None"""
+        row = self.lookup(name)
+        if row is None or not self.has_profile[row]:
+            return None
+        return self.male_pyramids[row], self.female_pyramids[row]
+
+    def profiles(self, rows):
+        """Current indicators for many rows at once as columns"""
+        rows = np.asarray(rows, dtype=np.intp)
+        result = {
+            "country": self.names[rows],
+            "population": self.population[rows],
+            "male_pyramid_data": self.male_pyramids[rows],
+            "female_pyramid_data": self.female_pyramids[rows],
+        }
+        for name in INDICATORS:
+            result[name] = self.indicators[name][rows]
+        return result
+
+    def history_range(self, rows, start_year=None, end_year=None, indicators=HISTORY_INDICATORS):
+        """History cube slice for rows x years in [start_year, end_year] x indicators"""
+        rows = np.asarray(rows, dtype=np.intp)
+        years = self.history_years
+        mask = np.ones(len(years), dtype=bool)
+        if start_year is not None:
+            mask &= years >= start_year
+        if end_year is not None:
+            mask &= years <= end_year
+        columns = [HISTORY_INDICATORS.index(name) for name in indicators]
+        return years[mask], self.history[np.ix_(rows, np.flatnonzero(mask), columns)]
+
+
+def _is_complete(record):
+    """True for CSV records with exactly the header's columns and a numeric year"""
+    if None in record or None in record.values():
+        return False
+    return not np.isnan(_to_float(record.get("Year")))
+
+
+def _pyramid(values):
+    pyramid = np.zeros(PYRAMID_WIDTH)
+    if values:
+        values = [float(v) for v in values][:PYRAMID_WIDTH]
+        pyramid[:len(values)] = values
+    return pyramid
+
+
+def _read_json(path):
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        logger.error(f"{path} file not found")
+        return {}
+    except json.JSONDecodeError as e:
+        logger.error(f"Error parsing {path}: {e}")
+        return {}
+
+
+def _read_csv(path):
+    try:
+        with open(path, "r", newline="") as f:
+            return list(csv.DictReader(f))
+    except FileNotFoundError:
+        logger.error(f"{path} file not found")
+        return []
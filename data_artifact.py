@@ -0,0 +1,277 @@
+"""Compiled, memory-mapped form of the demographic source files.
+
+demographics.json, demographics.csv and demographics_multi_year.csv are
+compiled into a directory of raw .npy arrays plus a meta.json, laid out like
+the compiled forests: the CountryStore columns, the 2025 snapshot table and
+the multi-year training table.  Country and region names are
+dictionary-encoded, with int32 codes into the countries.npy and
+regions.npy string tables.  Loading maps the arrays read-only instead of
+parsing text, and demographics_2025.js is generated from the same arrays.
+
+    python data_artifact.py    # rebuild after editing any of the sources
+
+meta.json records the SHA-256 of every source; the loaders fall back to
+parsing the text files when a source no longer matches.  Hashing costs time
+in proportion to the data, so the size and mtime each source had when it
+last matched are kept in source_stats.json (local, not versioned), and a
+source whose stats are unchanged is not read at all.
+`python data_artifact.py --verify` hashes every source regardless.
+"""
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+
+from country_store import HISTORY_INDICATORS, INDICATORS, SNAPSHOT_COLUMNS, CountryStore, _json_number
+
+logger = logging.getLogger(__name__)
+
+DATA_ARTIFACT_DIR = "data_artifact"
+SCHEMA_VERSION = 1
+
+PRESETS_PATH = "demographics.json"
+SNAPSHOT_PATH = "demographics.csv"
+HISTORY_PATH = "demographics_multi_year.csv"
+JS_PATH = "demographics_2025.js"
+JS_VARIABLE = "demographicData2025"
+
+# Numeric columns of demographics_multi_year.csv, as pandas reads them
+TRAINING_COLUMNS = ("Year",) + HISTORY_INDICATORS
+
+ARRAY_NAMES = (
+    "countries", "regions",
+    "store_country", "store_region", "population", "male_pyramids", "female_pyramids",
+    "indicators", "history_years", "history",
+    "snapshot_country", "snapshot",
+    "training_country", "training_region", "training",
+)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+SOURCE_PATHS = (PRESETS_PATH, SNAPSHOT_PATH, HISTORY_PATH)
+STATS_NAME = "source_stats.json"
+
+
+def _source_hashes():
+    return {path: file_hash(path) for path in SOURCE_PATHS if os.path.exists(path)}
+
+
+def _source_stats():
+    stats = {}
+    for path in SOURCE_PATHS:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            stats[path] = [stat.st_size, stat.st_mtime_ns]
+    return stats
+
+
+def _read_stats(path):
+    try:
+        with open(os.path.join(path, STATS_NAME), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_stats(path, stats):
+    # Replaced whole, so a process reading it concurrently never sees a partial file
+    partial = os.path.join(path, f"{STATS_NAME}.{os.getpid()}")
+    try:
+        with open(partial, "w") as f:
+            json.dump(stats, f)
+        os.replace(partial, os.path.join(path, STATS_NAME))
+    except OSError as e:
+        logger.info(f"Could not record source stats in {path}: {e}")  # only costs a rehash next time
+
+
+class _Dictionary:
+    """Assigns int32 codes to strings in first-seen order"""
+
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values):
+        return np.array([self.codes.setdefault(str(value), len(self.codes)) for value in values], dtype=np.int32)
+
+    def array(self):
+        return np.array(list(self.codes), dtype=str)
+
+
+def build_arrays():
+    """Every artifact array, from the text sources"""
+    import pandas as pd  # build step only; loading needs just NumPy
+
+    store = CountryStore.load(PRESETS_PATH, SNAPSHOT_PATH, HISTORY_PATH)
+    snapshot = pd.read_csv(SNAPSHOT_PATH)
+    training = pd.read_csv(HISTORY_PATH)
+    countries, regions = _Dictionary(), _Dictionary()
+
+    arrays = {
+        "store_country": countries.encode(store.names),
+        "store_region": regions.encode(store.regions),
+        "population": store.population,
+        "male_pyramids": store.male_pyramids,
+        "female_pyramids": store.female_pyramids,
+        "indicators": np.column_stack([store.indicators[name] for name in INDICATORS]),
+        "history_years": store.history_years,
+        "history": store.history,
+        "snapshot_country": countries.encode(snapshot["Country"]),
+        "snapshot": snapshot[list(SNAPSHOT_COLUMNS)].to_numpy(dtype=np.float64),
+        "training_country": countries.encode(training["Country"]),
+        "training_region": regions.encode(training["Region"]),
+        "training": training[list(TRAINING_COLUMNS)].to_numpy(dtype=np.float64),
+    }
+    arrays["countries"] = countries.array()
+    arrays["regions"] = regions.array()
+    return arrays
+
+
+def save(arrays, path=DATA_ARTIFACT_DIR):
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAY_NAMES:
+        np.save(os.path.join(path, f"{name}.npy"), arrays[name])
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "sources": _source_hashes(),
+        "indicators": list(INDICATORS),
+        "history_indicators": list(HISTORY_INDICATORS),
+        "snapshot_columns": list(SNAPSHOT_COLUMNS),
+        "training_columns": list(TRAINING_COLUMNS),
+    }
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    _write_stats(path, _source_stats())
+
+
+def load(path=DATA_ARTIFACT_DIR, mmap_mode="r"):
+    """(arrays, meta) of a saved artifact; raises FileNotFoundError if there is none"""
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        meta = json.load(f)
+    if meta.get("schema_version") != SCHEMA_VERSION:
+        raise ValueError(f"{path} has schema version {meta.get('schema_version')}, expected {SCHEMA_VERSION}")
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+    return arrays, meta
+
+
+def is_current(meta, path=DATA_ARTIFACT_DIR, verify=False):
+    """True if no source file has changed since the artifact was built.
+
+    Only sources whose size or mtime differ from the recorded ones are
+    hashed, or all of them with verify.
+    """
+    known = {} if verify else _read_stats(path)
+    current = _source_stats()
+    for source, stat in current.items():
+        if known.get(source) != stat and meta["sources"].get(source) != file_hash(source):
+            return False
+    if known != current:
+        _write_stats(path, current)  # e.g. touched by a checkout but unchanged
+    return True
+
+
+def _load_current(path):
+    """The artifact's (arrays, meta), or None (logged) when it is missing or out of date"""
+    try:
+        arrays, meta = load(path)
+    except FileNotFoundError:
+        logger.info(f"No data artifact at {path}; parsing the source files")
+        return None
+    except ValueError as e:
+        logger.warning(f"{e}; parsing the source files")
+        return None
+    if not is_current(meta, path):
+        logger.warning(f"Data artifact {path} is older than its sources; run `python data_artifact.py`")
+        return None
+    return arrays, meta
+
+
+def data_version(sources):
+    """Short digest of the source hashes, for keying anything derived from the data"""
+    return hashlib.sha256(json.dumps(sources, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def store_from_arrays(arrays):
+    countries, regions = arrays["countries"], arrays["regions"]
+    indicators = arrays["indicators"]
+    return CountryStore(
+        countries[arrays["store_country"]],
+        arrays["population"],
+        arrays["male_pyramids"],
+        arrays["female_pyramids"],
+        {name: indicators[:, column] for column, name in enumerate(INDICATORS)},
+        regions[arrays["store_region"]],
+        arrays["history_years"],
+        arrays["history"],
+    )
+
+
+def load_country_store(path=DATA_ARTIFACT_DIR):
+    """The CountryStore from the artifact, or from the text sources if it is missing or stale"""
+    loaded = _load_current(path)
+    if loaded is None:
+        store = CountryStore.load(PRESETS_PATH, SNAPSHOT_PATH, HISTORY_PATH)
+        store.data_version = data_version(_source_hashes())
+        return store
+    arrays, meta = loaded
+    store = store_from_arrays(arrays)
+    store.data_version = data_version(meta["sources"])
+    return store
+
+
+def training_frame(path=DATA_ARTIFACT_DIR):
+    """demographics_multi_year.csv as the DataFrame pandas.read_csv would give"""
+    import pandas as pd
+
+    loaded = _load_current(path)
+    if loaded is None:
+        return pd.read_csv(HISTORY_PATH)
+    arrays = loaded[0]
+    training = arrays["training"]
+    columns = {
+        "Country": arrays["countries"][arrays["training_country"]],
+        "Region": arrays["regions"][arrays["training_region"]],
+        "Year": training[:, 0].astype(np.int64),
+    }
+    for column, name in enumerate(HISTORY_INDICATORS, start=1):
+        columns[name] = training[:, column]
+    return pd.DataFrame(columns)
+
+
+def snapshot_js(arrays):
+    """demographics_2025.js: the 2025 snapshot as a JS object literal"""
+    names = arrays["countries"][arrays["snapshot_country"]]
+    data = {
+        str(name): {column: _json_number(value) for column, value in zip(SNAPSHOT_COLUMNS, row)}
+        for name, row in zip(names, arrays["snapshot"])
+    }
+    return f"const {JS_VARIABLE} = {json.dumps(data)};"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the demographic sources into the data artifact")
+    parser.add_argument("--verify", action="store_true", help="hash every source and report whether the artifact is current")
+    args = parser.parse_args()
+    if args.verify:
+        current = is_current(load()[1], verify=True)
+        print(f"{DATA_ARTIFACT_DIR}/ is {'up to date' if current else 'out of date; run python data_artifact.py'}")
+        raise SystemExit(0 if current else 1)
+
+    arrays = build_arrays()
+    save(arrays)
+    with open(JS_PATH, "w") as f:
+        f.write(snapshot_js(arrays))
+
+    size = sum(array.nbytes for array in arrays.values())
+    print(f"Saved {DATA_ARTIFACT_DIR}/: {len(arrays['store_country'])} countries, "
+          f"{len(arrays['training'])} training rows, {size / 1024:.0f} KB; regenerated {JS_PATH}")
@@ -0,0 +1,105 @@
+"""Feature layout of the rate models, resolved once when they are loaded.
+
+/predict used to build a dict over feature_names_in_ and wrap it in a
+one-row DataFrame on every call.  A FeatureSchema maps the request fields
+straight to column indices instead, so a request (or a whole batch) becomes
+one preallocated float64 matrix with any region one-hot columns set in
+place.  Columns the request does not cover stay 0.0, as before.
+"""
+import numpy as np
+
+# Request field -> training column
+FIELD_COLUMNS = {
+    "gdp": "GDP_per_capita",
+    "life": "Life_expectancy",
+    "urban": "Urbanization",
+}
+DEFAULT_FEATURES = tuple(FIELD_COLUMNS.values())
+REGION_PREFIX = "Region_"  # pandas.get_dummies naming for a 'Region' column
+
+
+class FeatureSchema:
+    """Column indices of a model's input matrix"""
+
+    def __init__(self, feature_names):
+        self.feature_names = tuple(str(name) for name in feature_names)
+        self.n_features = len(self.feature_names)
+        position = {name: index for index, name in enumerate(self.feature_names)}
+        self.field_index = {
+            field: position[column] for field, column in FIELD_COLUMNS.items() if column in position
+        }
+        self.region_index = {
+            name[len(REGION_PREFIX):].casefold(): index
+            for name, index in position.items() if name.startswith(REGION_PREFIX)
+        }
+
+    @classmethod
+    def from_model(cls, model):
+        names = getattr(model, "feature_names_in_", None)
+        return cls(DEFAULT_FEATURES if names is None else names)
+
+    def __eq__(self, other):
+        return isinstance(other, FeatureSchema) and self.feature_names == other.feature_names
+
+    def __hash__(self):
+        return hash(self.feature_names)
+
+    def build(self, columns, regions=None):
+        """An (n, n_features) float64 matrix from field -> length-n columns and optional region names"""
+        n = len(next(iter(columns.values())))
+        X = np.zeros((n, self.n_features))
+        for field, index in self.field_index.items():
+            X[:, index] = columns[field]
+        if regions is not None and self.region_index:
+            rows, cols = [], []
+            for row, region in enumerate(regions):
+                if not region:
+                    continue  # no region given: all region columns stay 0
+                index = self.region_index.get(str(region).casefold())
+                if index is None:
+                    raise ValueError(f"Unknown region '{region}'")
+                rows.append(row)
+                cols.append(index)
+            X[rows, cols] = 1.0
+        return X
+
+
+def parse_feature_request(data):
+    """Reads /predict bodies into (columns, regions, single).
+
+    Accepts one object {"gdp", "life", "urban", "region"?}, a batch
+    {"rows": [object, ...]}, or columns {"gdp": [...], "life": [...], ...}.
+    """
+    if "rows" in data:
+        rows = data["rows"]
+        columns = {field: np.array([float(row[field]) for row in rows]) for field in FIELD_COLUMNS}
+        regions = [row.get("region") for row in rows]
+        return columns, regions, False
+
+    single = not any(isinstance(data.get(field), list) for field in FIELD_COLUMNS)
+    columns = {field: np.atleast_1d(np.asarray(data[field], dtype=float)) for field in FIELD_COLUMNS}
+    n = max(len(column) for column in columns.values())
+    # Scalars apply to every row of a columnar batch
+    for field, column in columns.items():
+        if len(column) == 1:
+            columns[field] = np.repeat(column, n)
+        elif len(column) != n:
+            raise ValueError("Feature columns must have the same length")
+    regions = data.get("region")
+    if regions is not None and not isinstance(regions, list):
+        regions = [regions] * n
+    elif regions is not None and len(regions) != n:
+        raise ValueError("'region' must be one value or one per row")
+    return columns, regions, single
+
+
+def strip_feature_names(model):
+    """Drops feature_names_in_ from a fitted sklearn model once its FeatureSchema has been resolved.
+
+    The model is then fed plain arrays in schema order; with the names kept,
+    sklearn warns on every predict that the input has none.
+    """
+    model = getattr(model, "fallback_model", model)  # a rate surface wraps the forest it falls back to
+    if hasattr(model, "estimators_") and hasattr(model, "feature_names_in_"):
+        del model.feature_names_in_
+    return model
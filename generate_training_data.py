@@ -1,5 +1,27 @@
-import pandas as pd
+"""Synthetic demographic training data from per-tier trend parameters.
+
+    python generate_training_data.py                                   # the original 5-yearly set
+    python generate_training_data.py --year-step 1 --variants 1000 --noise 0.02 \
+        --format parquet --shards 8 --processes 8
+
+Rows are generated as NumPy arrays over (country x variant) units times
+years and written chunk by chunk, so memory stays at about --chunk-rows
+rows whatever the output size.  A variant jitters its country's tier
+parameters by up to +/- --spread (relative); --noise adds Gaussian
+observation noise to every value.
+
+The units are split into --shards contiguous shards, one output file
+each.  Every shard draws from its own generators spawned from
+SeedSequence(--seed), one per kind of draw, so its output depends only on
+the seed and the shard count, not on --processes or --chunk-rows.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pandas as pd
 import pycountry
 
 # Get all recognized countries (196+)
@@ -74,44 +96,138 @@ def assign_tier(country_name):
     else:
         return "LowIncome"
 
-years = list(range(2000, 2040, 5))
-
-records = []
-
-np.random.seed(42)  # for reproducibility
-
-for country in countries:
-    tier = assign_tier(country)
-    base = tiers[tier]
-    for year in years:
-        years_diff = year - 2025
-
-        # Calculate values based on base and growth rates
-        gdp = base["GDP"] * ((1 + base["GDP_growth"]) ** years_diff)
-        life = base["Life"] + base["Life_increase"] * (years_diff / 5)
-        urban = base["Urban"] + base["Urban_increase"] * (years_diff / 5)
-        fert = base["Fert"] - base["Fertility_decline"] * (years_diff / 5)
-        death = base["Death"] - base["Death_decline"] * (years_diff / 5)
-        mig = base["Mig"] + np.random.uniform(-base["Mig_variation"], base["Mig_variation"]) * (years_diff / 5)
-
-        # Clip values to reasonable ranges
-        fert = max(fert, 0.5)
-        death = max(death, 1)
-        urban = min(max(urban, 10), 100)
-        life = min(max(life, 40), 90)
-
-        records.append({
-            "Country": country,
-            "Year": year,
-            "GDP_per_capita": round(gdp, 2),
-            "Life_expectancy": round(life, 2),
-            "Urbanization": round(urban, 2),
-            "Fertility_rate": round(fert, 2),
-            "Death_rate": round(death, 2),
-            "Migration_rate": round(mig, 2)
-        })
-
-df = pd.DataFrame(records)
-
-df.to_csv("demographics_196_countries.csv", index=False)
-print(f"Generated demographics_196_countries.csv with {len(df)} rows for {len(countries)} countries.")
+# Tier parameters as a (tier, parameter) matrix, in TIER_NAMES x PARAMETERS order
+TIER_NAMES = list(tiers)
+PARAMETERS = list(tiers["Developed"])
+TIER_PARAMETERS = np.array([[tiers[tier][name] for name in PARAMETERS] for tier in TIER_NAMES])
+P = {name: column for column, name in enumerate(PARAMETERS)}
+
+COUNTRY_NAMES = np.array(countries, dtype=object)
+COUNTRY_TIERS = np.array([TIER_NAMES.index(assign_tier(country)) for country in countries])
+
+BASE_YEAR = 2025
+OUTPUT_PATH = "demographics_196_countries"
+CHUNK_ROWS = 1_000_000
+
+
+def shard_path(output, fmt, shard, shards):
+    suffix = f"-{shard:05d}-of-{shards:05d}" if shards > 1 else ""
+    return f"{output}{suffix}.{fmt}"
+
+
+def generate_chunk(units, years, variants, spread, noise, rngs):
+    """Columns for the (country x variant) units in `units` over `years`, as a dict of flat arrays"""
+    param_rng, migration_rng, noise_rng = rngs
+    country = units // variants
+    params = TIER_PARAMETERS[COUNTRY_TIERS[country]]
+    if spread > 0:
+        params = params * (1 + spread * param_rng.uniform(-1, 1, params.shape))
+
+    def column(name):
+        return params[:, P[name], None]
+
+    years_diff = (years - BASE_YEAR)[None, :]
+    steps = years_diff / 5
+
+    # Calculate values based on base and growth rates
+    values = {
+        "GDP_per_capita": column("GDP") * (1 + column("GDP_growth")) ** years_diff,
+        "Life_expectancy": column("Life") + column("Life_increase") * steps,
+        "Urbanization": column("Urban") + column("Urban_increase") * steps,
+        "Fertility_rate": column("Fert") - column("Fertility_decline") * steps,
+        "Death_rate": column("Death") - column("Death_decline") * steps,
+        "Migration_rate": column("Mig") + column("Mig_variation") * steps
+        * migration_rng.uniform(-1, 1, (len(units), len(years))),
+    }
+    if noise > 0:
+        # One draw block per unit, so chunk boundaries do not change the stream
+        draws = noise_rng.standard_normal((len(units), len(years), len(values)))
+        for index, name in enumerate(values):
+            values[name] = values[name] * (1 + noise * draws[:, :, index])
+
+    # Clip values to reasonable ranges
+    values["Fertility_rate"] = np.maximum(values["Fertility_rate"], 0.5)
+    values["Death_rate"] = np.maximum(values["Death_rate"], 1)
+    values["Urbanization"] = np.clip(values["Urbanization"], 10, 100)
+    values["Life_expectancy"] = np.clip(values["Life_expectancy"], 40, 90)
+
+    chunk = {
+        "Country": COUNTRY_NAMES[np.repeat(country, len(years))],
+        "Year": np.tile(years, len(units)),
+    }
+    if variants > 1:
+        chunk["Variant"] = np.repeat(units % variants, len(years))
+    for name, value in values.items():
+        chunk[name] = np.round(value, 2).ravel()
+    return chunk
+
+
+def write_shard(shard, shards, years, variants, spread, noise, seed, output, fmt, chunk_rows):
+    """Generates and writes one shard; returns (path, rows)"""
+    n_units = len(countries) * variants
+    bounds = np.linspace(0, n_units, shards + 1).astype(np.int64)
+    start, stop = int(bounds[shard]), int(bounds[shard + 1])
+    rngs = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(shards)[shard].spawn(3)]
+    units_per_chunk = max(1, chunk_rows // len(years))
+    path = shard_path(output, fmt, shard, shards)
+
+    chunks = (
+        pd.DataFrame(generate_chunk(
+            np.arange(chunk_start, min(chunk_start + units_per_chunk, stop)), years, variants, spread, noise, rngs
+        ))
+        for chunk_start in range(start, stop, units_per_chunk)
+    )
+    rows = 0
+    if fmt == "csv":
+        with open(path, "w", newline="") as f:
+            for df in chunks:
+                df.to_csv(f, header=rows == 0, index=False)
+                rows += len(df)
+    else:
+        import pyarrow as pa  # optional: only needed for --format parquet
+        import pyarrow.parquet as pq
+        writer = None
+        try:
+            for df in chunks:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+                rows += len(df)
+        finally:
+            if writer is not None:
+                writer.close()
+    return path, rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic demographic training data")
+    parser.add_argument("--start-year", type=int, default=2000)
+    parser.add_argument("--end-year", type=int, default=2040, help="exclusive")
+    parser.add_argument("--year-step", type=int, default=5)
+    parser.add_argument("--variants", type=int, default=1, help="parameter variants per country")
+    parser.add_argument("--spread", type=float, default=0.0, help="relative jitter of a variant's tier parameters")
+    parser.add_argument("--noise", type=float, default=0.0, help="relative Gaussian noise on every value")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--shards", type=int, default=1, help="output files; together with --seed fixes the data")
+    parser.add_argument("--processes", type=int, default=1, help="shards generated concurrently")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows held in memory per shard")
+    parser.add_argument("--format", choices=("csv", "parquet"), default="csv")
+    parser.add_argument("--output", default=OUTPUT_PATH, help="output path without extension")
+    args = parser.parse_args()
+
+    years = np.arange(args.start_year, args.end_year, args.year_step)
+    shard_args = (args.shards, years, args.variants, args.spread, args.noise, args.seed,
+                  args.output, args.format, args.chunk_rows)
+    started = time.perf_counter()
+    if args.processes > 1 and args.shards > 1:
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            results = list(executor.map(write_shard, range(args.shards), *([a] * args.shards for a in shard_args)))
+    else:
+        results = [write_shard(shard, *shard_args) for shard in range(args.shards)]
+
+    total = sum(rows for _, rows in results)
+    size = sum(os.path.getsize(path) for path, _ in results)
+    print(f"Generated {total} rows for {len(countries)} countries in {len(results)} file(s) "
+          f"({size / 1e6:.1f} MB, {time.perf_counter() - started:.1f} s): "
+          f"{', '.join(path for path, _ in results[:3])}{' ...' if len(results) > 3 else ''}")
@@ -0,0 +1,158 @@
+"""In-process request metrics in the Prometheus text format.
+
+Three pieces:
+
+* per-route latency histograms, recorded by app.py's request hooks,
+* phase timers (`with timed("model_predict"): ...`) around the internal hot
+  spots: model inference, chart drawing, savefig and base64 encoding,
+* an opt-in per-request profiler: with METRICS_PROFILING=1, a request sent
+  with an `X-Profile` header runs under cProfile and gets the pstats summary
+  back instead of its normal body.
+
+Everything is exposed at /metrics.  METRICS=0 turns recording off; timed()
+then hands back a shared no-op context manager, so the instrumented code
+costs one attribute check per call.  Phases that run in worker processes
+(see worker_pool.py) are recorded in those processes, not here.
+"""
+import bisect
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from contextlib import nullcontext
+
+enabled = os.environ.get("METRICS", "1") != "0"
+profiling_enabled = os.environ.get("METRICS_PROFILING", "0") == "1"
+
+# Upper bounds in seconds, Prometheus-style (a +Inf bucket is implied)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+PROFILE_LINES = 30
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            base = _format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                le = bound if isinstance(bound, str) else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{base}{"," if base else ""}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {values[-1]!r}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return lines
+
+
+def _format_labels(names, values):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+request_latency = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route, method and status",
+    ("route", "method", "status"), LATENCY_BUCKETS
+)
+phase_latency = Histogram(
+    "app_phase_duration_seconds", "Time spent in internal phases of a request",
+    ("phase",), PHASE_BUCKETS
+)
+
+
+class _PhaseTimer:
+    __slots__ = ("labels", "start")
+
+    def __init__(self, phase):
+        self.labels = (phase,)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        phase_latency.observe(self.labels, time.perf_counter() - self.start)
+        return False
+
+
+_NOOP = nullcontext()
+
+
+def timed(phase):
+    """Context manager recording the duration of a phase (no-op when metrics are off)"""
+    return _PhaseTimer(phase) if enabled else _NOOP
+
+
+def observe_request(route, method, status, seconds):
+    if enabled:
+        request_latency.observe((route, method, str(status)), seconds)
+
+
+def format_samples(name, kind, help_text, samples):
+    """Prometheus lines for a counter or gauge; samples is [(labels dict, value)]"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        label_text = _format_labels(labels.keys(), labels.values())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return lines
+
+
+def render(extra_lines=()):
+    """The full /metrics body"""
+    lines = request_latency.render() + phase_latency.render() + list(extra_lines)
+    return "\n".join(lines) + "\n"
+
+
+_profile_lock = threading.Lock()
+
+
+def start_profile():
+    """Starts a cProfile session for this request, or returns None if one is already running"""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def finish_profile(profiler, sort="cumulative", limit=PROFILE_LINES):
+    """Stops a session from start_profile and returns its pstats summary as text"""
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+    out = io.StringIO()
+    stats = pstats.Stats(profiler, stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,206 @@
+"""Lazy, process-shareable access to the rate-change models.
+
+Nothing is read from disk until a route first needs a prediction.  Compiled
+forests are memory-mapped read-only, so every worker process maps the same
+page-cache pages instead of unpickling its own copy of the trees; the
+sklearn pickles are only used when no compiled models exist, and otherwise
+unpickled on the first batch of SKLEARN_BATCH_ROWS rows or more, which
+sklearn evaluates faster.
+"""
+import functools
+import hashlib
+import logging
+import os
+import threading
+
+from compiled_forest import COMPILED_MODELS_DIR, SKLEARN_MIN_ROWS, compiled_models_digest, load_compiled_models
+from feature_schema import FeatureSchema, strip_feature_names
+from projection_engine import RateChangeCache
+from rate_surface import RATE_SURFACE_PATH, RateSurface, meta_path, surface_models
+from worker_pool import pooled_models
+
+logger = logging.getLogger(__name__)
+
+PICKLE_PATHS = ("birth_model.pkl", "death_model.pkl", "migration_model.pkl")
+
+
+def load_pickled_model(path):
+    import joblib  # pulls in sklearn, so only when the pickles are needed
+    return joblib.load(path)
+
+
+def load_batch_model(path):
+    """A pickled forest for a compiled one's large batches; the compiled forest keeps the schema"""
+    return strip_feature_names(load_pickled_model(path))
+
+
+def files_digest(paths, *extra):
+    """Short SHA-256 over the contents of paths plus any extra values"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    for value in extra:
+        digest.update(str(value).encode())
+    return digest.hexdigest()[:16]
+
+
+class ModelRegistry:
+    """Loads the birth, death and migration models on first use"""
+
+    def __init__(self, compiled_dir=COMPILED_MODELS_DIR, pickle_paths=PICKLE_PATHS,
+                 surface_mode="off", surface_path=RATE_SURFACE_PATH, mmap=True, cache_size=1024,
+                 pool=None, sklearn_batch_rows=SKLEARN_MIN_ROWS):
+        self.compiled_dir = compiled_dir
+        self.pickle_paths = pickle_paths
+        self.surface_mode = surface_mode
+        self.surface_path = surface_path
+        self.mmap = mmap
+        self.pool = pool  # a WorkerPool to evaluate the models in, if any
+        self.sklearn_batch_rows = sklearn_batch_rows  # 0: compiled forests evaluate every batch
+        self.batch_dispatch = False
+        self.source = None
+        self.surface = None
+        self.load_error = None
+        self.schemas = None  # one FeatureSchema per model, resolved at load
+        self._version = None
+        self.rate_cache = RateChangeCache(self.get_models, maxsize=cache_size)
+        self._models = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, pool=None):
+        """Builds a registry configured by COMPILED_MODELS_DIR, RATE_SURFACE_MODE, RATE_SURFACE_PATH,
+        MODEL_MMAP and SKLEARN_BATCH_ROWS"""
+        return cls(
+            compiled_dir=os.environ.get("COMPILED_MODELS_DIR", COMPILED_MODELS_DIR),
+            surface_mode=os.environ.get("RATE_SURFACE_MODE", "off").lower(),
+            surface_path=os.environ.get("RATE_SURFACE_PATH", RATE_SURFACE_PATH),
+            mmap=os.environ.get("MODEL_MMAP", "1") != "0",
+            pool=pool,
+            sklearn_batch_rows=int(os.environ.get("SKLEARN_BATCH_ROWS", str(SKLEARN_MIN_ROWS)) or 0),
+        )
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get_models(self):
+        """Returns the (birth, death, migration) models, or None if they could not be loaded"""
+        if self._loaded:
+            return self._models
+        with self._lock:
+            if not self._loaded:
+                self._models = self._load()
+                self._loaded = True
+        return self._models
+
+    def _load(self):
+        try:
+            if os.path.isdir(self.compiled_dir):
+                models = load_compiled_models(self.compiled_dir, mmap_mode="r" if self.mmap else None)
+                self.source = "compiled"
+                self.batch_dispatch = self.sklearn_batch_rows > 0 and all(
+                    os.path.exists(path) for path in self.pickle_paths
+                )
+                if self.batch_dispatch:
+                    for model, path in zip(models, self.pickle_paths):
+                        model.use_sklearn_for_large_batches(
+                            functools.partial(load_batch_model, path), self.sklearn_batch_rows
+                        )
+            else:
+                models = tuple(load_pickled_model(path) for path in self.pickle_paths)
+                self.source = "pickle"
+            logger.info(f"AI models loaded successfully ({self.source})")
+        except FileNotFoundError as e:
+            logger.error(f"Model file not found: {e}")
+            self.load_error = str(e)
+            return None
+        except Exception as e:
+            logger.error(f"Error loading models: {e}")
+            self.load_error = str(e)
+            return None
+
+        if self.surface_mode in ("nearest", "linear"):
+            try:
+                surface = RateSurface.load(self.surface_path)
+                if self._surface_matches(surface):
+                    self.surface = surface
+                    models = surface_models(surface, models, interpolate=self.surface_mode == "linear")
+                    logger.info(f"Rate surface loaded ({self.surface_mode} lookup)")
+                else:
+                    logger.error(
+                        f"Rate surface {self.surface_path} was built from other models; using the models directly. "
+                        f"Rebuild it with `python rate_surface.py`"
+                    )
+            except FileNotFoundError as e:
+                logger.error(f"Rate surface not found, using the models directly: {e}")
+
+        self.schemas = tuple(FeatureSchema.from_model(model) for model in models)
+        if self.source == "pickle":
+            for model in models:
+                strip_feature_names(model)
+        self._version = self._files_version()
+
+        if self.pool is not None:
+            # The workers load their own copy; this process only keeps the schema
+            models = pooled_models(self.pool, models)
+        return models
+
+    def _surface_matches(self, surface):
+        """True if the surface tabulates the compiled models being served"""
+        if self.source != "compiled" or surface.models_version is None:
+            return False  # built from compiled models, so only checkable against them
+        return surface.models_version == compiled_models_digest(self.compiled_dir)
+
+    def _files_version(self):
+        if self.source == "compiled":
+            paths = sorted(
+                os.path.join(root, name) for root, _, names in os.walk(self.compiled_dir) for name in names
+            )
+            if self.batch_dispatch:
+                paths += list(self.pickle_paths)
+        else:
+            paths = list(self.pickle_paths)
+        mode = "off"
+        if self.surface is not None:
+            paths += [self.surface_path, meta_path(self.surface_path)]
+            mode = self.surface_mode
+        return files_digest(paths, self.source, mode)
+
+    def version(self):
+        """Content hash of the model files in use (changes on retraining), or None if they failed to load"""
+        self.get_models()
+        return self._version
+
+    def feature_matrices(self, columns, regions=None):
+        """One input matrix per model, built once per distinct schema"""
+        built = {}
+        return tuple(
+            built[schema] if schema in built else built.setdefault(schema, schema.build(columns, regions))
+            for schema in self.schemas
+        )
+
+    def available(self):
+        """True if the models are loaded or their files are present on disk"""
+        if self._loaded:
+            return self._models is not None
+        return os.path.isdir(self.compiled_dir) or all(os.path.exists(p) for p in self.pickle_paths)
+
+    def status(self):
+        surface = self.surface
+        return {
+            "loaded": self._loaded,
+            "source": self.source,
+            "error": self.load_error,
+            "pooled": self.pool is not None,
+            "sklearn_batch_rows": self.sklearn_batch_rows if self.batch_dispatch else None,
+            "version": self._version,
+            "rate_surface": {
+                "mode": self.surface_mode if surface is not None else "off",
+                "max_error": surface.error_report.get(self.surface_mode) if surface is not None else None
+            }
+        }
@@ -0,0 +1,228 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import timed
+
+# Bounds applied to the AI-predicted rate changes (percent per year)
+BIRTH_CHANGE_LIMIT = 3
+DEATH_CHANGE_LIMIT = 3
+MIGRATION_CHANGE_LIMIT = 1
+
+# Realistic demographic bounds for the rates themselves (as decimals)
+MIN_VITAL_RATE = 0.005   # 5 per 1000
+MAX_VITAL_RATE = 0.050   # 50 per 1000
+MAX_MIGRATION_RATE = 0.030  # ±30 per 1000
+MAX_NATURAL_GROWTH = 0.035  # birth rate may exceed death rate by at most 3.5%
+
+MIN_POPULATION = 1000
+MAX_POPULATION_MULTIPLE = 10  # cap at 10x the starting population
+
+START_YEAR = 2025
+
+
+def predict_rate_changes(models, gdp_growth, life_growth, urban_growth):
+    """Runs the birth, death and migration models once for a growth scenario"""
+    birth_model, death_model, migration_model = models
+    X = np.array([[gdp_growth, life_growth, urban_growth]])
+    with timed("model_predict"):
+        return (
+            birth_model.predict(X)[0],
+            death_model.predict(X)[0],
+            migration_model.predict(X)[0],
+        )
+
+
+class RateChangeCache:
+    """Bounded LRU cache of predicted rate changes keyed by the (gdp, life, urban) growth triple.
+
+    load_models is called on a miss to get the (birth, death, migration)
+    models, so they can be loaded lazily.
+    """
+
+    def __init__(self, load_models, maxsize=1024):
+        self.load_models = load_models
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, gdp_growth, life_growth, urban_growth):
+        key = (float(gdp_growth), float(life_growth), float(urban_growth))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        changes = predict_rate_changes(self.load_models(), *key)
+
+        with self._lock:
+            self._entries[key] = changes
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return changes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def predict_rate_changes_batch(models, scenarios):
+    """Runs each model once over an N x 3 matrix of (gdp, life, urban) growth scenarios"""
+    birth_model, death_model, migration_model = models
+    X = np.asarray(scenarios, dtype=float).reshape(-1, 3)
+    with timed("model_predict"):
+        return (
+            birth_model.predict(X),
+            death_model.predict(X),
+            migration_model.predict(X),
+        )
+
+
+def build_scenario_grid(gdp_values, life_values, urban_values):
+    """Returns the cartesian product of the three growth axes as an N x 3 matrix"""
+    gdp, life, urban = np.meshgrid(
+        np.asarray(gdp_values, dtype=float),
+        np.asarray(life_values, dtype=float),
+        np.asarray(urban_values, dtype=float),
+        indexing="ij",
+    )
+    return np.column_stack([gdp.ravel(), life.ravel(), urban.ravel()])
+
+
+def iter_scenarios(population, birth_rate, death_rate, migration_rate,
+                   rate_changes, years_to_project):
+    """Advances N scenarios together, yielding one year at a time.
+
+    Takes the same arguments as project_scenarios.  Yields
+    (population, (birth, death, migration)) for years 0..years_to_project,
+    each a length-N float array, so callers that stream results only ever
+    hold the current year in memory.
+    """
+    if rate_changes is not None:
+        n = np.broadcast(population, birth_rate, death_rate, migration_rate, *rate_changes).size
+    else:
+        n = np.broadcast(population, birth_rate, death_rate, migration_rate).size
+
+    population = np.broadcast_to(np.asarray(population, dtype=float), (n,))
+    birth_rate = np.broadcast_to(np.asarray(birth_rate, dtype=float), (n,))
+    death_rate = np.broadcast_to(np.asarray(death_rate, dtype=float), (n,))
+    migration_rate = np.broadcast_to(np.asarray(migration_rate, dtype=float), (n,))
+
+    current_population = population
+    yield current_population, (birth_rate, death_rate, migration_rate)
+
+    if rate_changes is None:
+        net_rate = birth_rate - death_rate + migration_rate
+        for year in range(1, years_to_project + 1):
+            current_population = np.maximum(current_population * (1 + net_rate), MIN_POPULATION)
+            yield current_population, (birth_rate, death_rate, migration_rate)
+        return
+
+    birth_change, death_change, migration_change = (np.asarray(c, dtype=float) for c in rate_changes)
+
+    # Clip changes to reasonable bounds and turn them into yearly growth factors
+    birth_factor = 1 + np.clip(birth_change, -BIRTH_CHANGE_LIMIT, BIRTH_CHANGE_LIMIT) / 100
+    death_factor = 1 + np.clip(death_change, -DEATH_CHANGE_LIMIT, DEATH_CHANGE_LIMIT) / 100
+    migration_factor = 1 + np.clip(migration_change, -MIGRATION_CHANGE_LIMIT, MIGRATION_CHANGE_LIMIT) / 100
+
+    max_population = population * MAX_POPULATION_MULTIPLE
+
+    for year in range(1, years_to_project + 1):
+        birth_rate = np.clip(birth_rate * birth_factor, MIN_VITAL_RATE, MAX_VITAL_RATE)
+        death_rate = np.clip(death_rate * death_factor, MIN_VITAL_RATE, MAX_VITAL_RATE)
+        migration_rate = np.clip(migration_rate * migration_factor, -MAX_MIGRATION_RATE, MAX_MIGRATION_RATE)
+
+        birth_rate = np.minimum(birth_rate, death_rate + MAX_NATURAL_GROWTH)
+
+        net_rate = birth_rate - death_rate + migration_rate
+        current_population = np.maximum(current_population * (1 + net_rate), MIN_POPULATION)
+        current_population = np.minimum(current_population, max_population)
+
+        yield current_population, (birth_rate, death_rate, migration_rate)
+
+
+def project_scenarios(population, birth_rate, death_rate, migration_rate,
+                      rate_changes, years_to_project, return_rate_paths=False):
+    """Advances N scenarios together as a (years + 1) x N array.
+
+    population and the three starting rates may be scalars or length-N arrays.
+    rate_changes is a (birth, death, migration) tuple of length-N arrays of
+    percent changes per year, or None to hold the starting rates constant.
+    The same clipping and bounds as the single-scenario recurrence are applied
+    elementwise, so each column matches project_trajectory exactly.
+
+    Returns (populations, (final_birth, final_death, final_migration)) where
+    populations is an int64 array of rounded values, one column per scenario.
+    With return_rate_paths the birth, death and migration rates of every year
+    are returned as a third element, each a (years + 1) x N array.
+    """
+    populations = rate_paths = None
+    steps = iter_scenarios(population, birth_rate, death_rate, migration_rate, rate_changes, years_to_project)
+    for year, (current_population, rates) in enumerate(steps):
+        if populations is None:
+            n = len(current_population)
+            populations = np.empty((years_to_project + 1, n), dtype=np.int64)
+            if return_rate_paths:
+                rate_paths = np.empty((3, years_to_project + 1, n))
+        populations[year] = np.rint(current_population)
+        if return_rate_paths:
+            rate_paths[:, year] = rates
+
+    if return_rate_paths:
+        return populations, rates, tuple(rate_paths)
+    return populations, rates
+
+
+def scenario_grid_slice(gdp_values, life_values, urban_values, start, stop):
+    """Rows start..stop of build_scenario_grid without building the whole grid"""
+    axes = [np.asarray(values, dtype=float) for values in (gdp_values, life_values, urban_values)]
+    indices = np.unravel_index(np.arange(start, stop), tuple(len(axis) for axis in axes))
+    return np.column_stack([axis[index] for axis, index in zip(axes, indices)])
+
+
+def summarize_projections(populations, start_year=START_YEAR):
+    """Reduces a (years + 1) x N population array to per-scenario summary statistics"""
+    peak_index = populations.argmax(axis=0)
+    return {
+        "final_population": populations[-1],
+        "peak_year": peak_index + start_year,
+        "peak_population": populations.max(axis=0),
+        "min_population": populations.min(axis=0),
+        "max_population": populations.max(axis=0),
+    }
+
+
+def project_trajectory(population, birth_rate, death_rate, migration_rate,
+                       rate_changes, years_to_project):
+    """Advances a population year by year for one scenario.
+
+    rate_changes is the (birth, death, migration) percent change per year as
+    returned by predict_rate_changes, or None when inference failed, in which
+    case the starting rates are held constant.
+
+    Returns (populations, (final_birth, final_death, final_migration)).
+    """
+    populations, final_rates = project_scenarios(
+        population, birth_rate, death_rate, migration_rate,
+        rate_changes, years_to_project
+    )
+    populations = populations[:, 0].tolist()
+    # The starting value is reported as given, like the original loop did
+    populations[0] = population
+    return populations, tuple(float(rate[0]) for rate in final_rates)
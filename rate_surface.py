@@ -0,0 +1,203 @@
+"""Precomputed response surface of the three rate-change models.
+
+The models only take three bounded growth percentages, so their whole
+output can be tabulated once on a regular 3-D grid and answered at request
+time by lookup (nearest grid point or trilinear interpolation) instead of
+walking 300 trees.  The table is stored as a memory-mapped .npy file with a
+JSON sidecar describing the axes, the measured error against the forests
+and the digest of the compiled models it was built from; the model registry
+refuses a surface whose digest no longer matches the models.
+
+Build it with `python rate_surface.py [--step 0.25]` after (re)training.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+from projection_engine import BIRTH_CHANGE_LIMIT, DEATH_CHANGE_LIMIT, MIGRATION_CHANGE_LIMIT
+
+RATE_SURFACE_PATH = "rate_surface.npy"
+
+# Same ranges the frontend allows for the growth inputs (percent per year)
+GDP_RANGE = (-10.0, 15.0)
+LIFE_RANGE = (-5.0, 10.0)
+URBAN_RANGE = (-5.0, 10.0)
+DEFAULT_STEP = 0.25
+
+BUILD_CHUNK_SIZE = 4096
+ERROR_CHECK_SAMPLES = 20000
+
+
+def meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def surface_axes(step=DEFAULT_STEP):
+    """Grid coordinates along the gdp, life and urban axes"""
+    axes = []
+    for low, high in (GDP_RANGE, LIFE_RANGE, URBAN_RANGE):
+        count = int(round((high - low) / step)) + 1
+        axes.append(low + step * np.arange(count))
+    return axes
+
+
+class RateSurface:
+    """Lookup table of (birth, death, migration) rate changes over the growth grid"""
+
+    def __init__(self, values, starts, steps, error_report=None, models_version=None):
+        self.values = values  # shape (n_gdp, n_life, n_urban, 3)
+        self.starts = np.asarray(starts, dtype=float)
+        self.steps = np.asarray(steps, dtype=float)
+        self.shape = np.asarray(values.shape[:3])
+        self.stops = self.starts + self.steps * (self.shape - 1)
+        self.error_report = error_report or {}
+        self.models_version = models_version  # compiled_models_digest() of the forests tabulated
+
+    @classmethod
+    def load(cls, path=RATE_SURFACE_PATH):
+        with open(meta_path(path), "r") as f:
+            meta = json.load(f)
+        values = np.load(path, mmap_mode="r")
+        return cls(values, meta["starts"], meta["steps"], meta.get("error_report"), meta.get("models_version"))
+
+    def save(self, path=RATE_SURFACE_PATH):
+        np.save(path, np.ascontiguousarray(self.values))
+        meta = {
+            "starts": self.starts.tolist(),
+            "steps": self.steps.tolist(),
+            "shape": self.shape.tolist(),
+            "error_report": self.error_report,
+            "models_version": self.models_version,
+        }
+        with open(meta_path(path), "w") as f:
+            json.dump(meta, f, indent=2)
+
+    def in_range(self, X):
+        X = np.asarray(X, dtype=float).reshape(-1, 3)
+        return np.all((X >= self.starts) & (X <= self.stops), axis=1)
+
+    def lookup(self, X, interpolate=False):
+        """Rate changes for each row of X, shape (n, 3); rows must be in range"""
+        X = np.asarray(X, dtype=float).reshape(-1, 3)
+        position = (X - self.starts) / self.steps
+
+        if not interpolate:
+            i, j, k = np.clip(np.rint(position).astype(np.intp), 0, self.shape - 1).T
+            return np.asarray(self.values[i, j, k])
+
+        # Trilinear interpolation between the 8 surrounding grid points
+        lower = np.clip(np.floor(position).astype(np.intp), 0, self.shape - 2)
+        frac = np.clip(position - lower, 0.0, 1.0)
+        result = np.zeros((X.shape[0], 3))
+        for corner in range(8):
+            offset = np.array([(corner >> 2) & 1, (corner >> 1) & 1, corner & 1])
+            weight = np.prod(np.where(offset, frac, 1.0 - frac), axis=1)
+            i, j, k = (lower + offset).T
+            result += weight[:, None] * self.values[i, j, k]
+        return result
+
+
+class SurfaceModel:
+    """Model-like view of one column of a RateSurface.
+
+    Exposes predict() like the forests so the projection engine can use it
+    unchanged; rows outside the tabulated range are sent to the real model.
+    """
+
+    def __init__(self, surface, column, fallback_model, interpolate=False):
+        self.surface = surface
+        self.column = column
+        self.fallback_model = fallback_model
+        self.interpolate = interpolate
+        self.n_features_in_ = 3
+        if hasattr(fallback_model, "feature_names_in_"):
+            self.feature_names_in_ = fallback_model.feature_names_in_
+
+    def predict(self, X):
+        X = np.asarray(X, dtype=float).reshape(-1, 3)
+        inside = self.surface.in_range(X)
+        result = np.empty(X.shape[0])
+        if inside.any():
+            result[inside] = self.surface.lookup(X[inside], self.interpolate)[:, self.column]
+        if not inside.all():
+            result[~inside] = self.fallback_model.predict(X[~inside])
+        return result
+
+
+def surface_models(surface, models, interpolate=False):
+    """Wraps the birth, death and migration models with surface lookups"""
+    return tuple(
+        SurfaceModel(surface, column, model, interpolate)
+        for column, model in enumerate(models)
+    )
+
+
+def build_rate_surface(models, step=DEFAULT_STEP):
+    """Evaluates the three models on every point of the growth grid"""
+    axes = surface_axes(step)
+    shape = tuple(len(axis) for axis in axes)
+    gdp, life, urban = np.meshgrid(*axes, indexing="ij")
+    X = np.column_stack([gdp.ravel(), life.ravel(), urban.ravel()])
+
+    values = np.empty((X.shape[0], 3))
+    for start in range(0, X.shape[0], BUILD_CHUNK_SIZE):
+        chunk = X[start:start + BUILD_CHUNK_SIZE]
+        for column, model in enumerate(models):
+            values[start:start + BUILD_CHUNK_SIZE, column] = model.predict(chunk)
+
+    starts = [axis[0] for axis in axes]
+    return RateSurface(values.reshape(shape + (3,)), starts, [step] * 3)
+
+
+def measure_surface_error(surface, models, samples=ERROR_CHECK_SAMPLES, seed=0):
+    """Max and mean absolute error of both lookup modes against the real models.
+
+    "clipped_max" is the error left after the projection engine clips the
+    changes to its per-year limits, which is what actually reaches a projection.
+    """
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(surface.starts, surface.stops, size=(samples, 3))
+    expected = np.column_stack([model.predict(X) for model in models])
+    limits = np.array([BIRTH_CHANGE_LIMIT, DEATH_CHANGE_LIMIT, MIGRATION_CHANGE_LIMIT])
+
+    report = {}
+    for mode, interpolate in (("nearest", False), ("linear", True)):
+        looked_up = surface.lookup(X, interpolate)
+        error = np.abs(looked_up - expected)
+        clipped_error = np.abs(np.clip(looked_up, -limits, limits) - np.clip(expected, -limits, limits))
+        report[mode] = {
+            name: {
+                "max": float(error[:, column].max()),
+                "mean": float(error[:, column].mean()),
+                "clipped_max": float(clipped_error[:, column].max()),
+                "clipped_mean": float(clipped_error[:, column].mean()),
+            }
+            for column, name in enumerate(("birth", "death", "migration"))
+        }
+    report["samples"] = samples
+    return report
+
+
+if __name__ == "__main__":
+    from compiled_forest import COMPILED_MODELS_DIR, compiled_models_digest, load_compiled_models
+
+    parser = argparse.ArgumentParser(description="Tabulate the rate-change models on a growth grid")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP, help="grid spacing in percentage points")
+    parser.add_argument("--output", default=RATE_SURFACE_PATH)
+    args = parser.parse_args()
+
+    models = load_compiled_models(COMPILED_MODELS_DIR)
+    surface = build_rate_surface(models, args.step)
+    surface.error_report = measure_surface_error(surface, models)
+    surface.models_version = compiled_models_digest(COMPILED_MODELS_DIR)
+    surface.save(args.output)
+
+    print(f"Saved {args.output}: grid {surface.shape.tolist()}, {surface.values.nbytes / 1e6:.1f} MB")
+    for mode in ("nearest", "linear"):
+        errors = ", ".join(
+            f"{name} {stats['max']:.3f} (clipped {stats['clipped_max']:.3f})"
+            for name, stats in surface.error_report[mode].items()
+        )
+        print(f"  max |error| ({mode}): {errors}")
@@ -0,0 +1,343 @@
+"""Bulk report exports: pyramids and scenario projections for many countries.
+
+An export is a background job.  The projections of every country under
+every scenario are computed up front in one vectorized pass (one batched
+inference over the scenarios, one project_scenarios call over all
+country x scenario pairs).  Drawing the figures is the slow part, so each
+figure goes to a dedicated process pool whose workers draw with
+matplotlib's Figure/Agg API, never pyplot.  The job thread writes every
+finished page straight to disk as its result arrives, in whatever order
+the pages finish:
+
+* "pdf": one raster page per figure, via a small streaming PDF writer.
+  Workers return zlib-compressed RGB, so assembling the file costs the
+  job thread nothing but writes.
+* "zip": a PNG per figure plus a CSV of the projected series per country.
+
+The file is written as <id>.<format>.part and renamed when complete.
+Progress is reported via ExportJob.status().  Export files are deleted
+JOB_TTL after they were last written by a sweep of the directory itself
+(at start-up, on lookups and every SWEEP_INTERVAL), so files left by a
+previous process are cleaned up as well.
+"""
+import atexit
+import csv
+import io
+import logging
+import multiprocessing
+import os
+import re
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from charts import DEFAULT_DPI, pyramid_figure
+from projection_engine import START_YEAR, predict_rate_changes_batch, project_scenarios
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"pdf": "application/pdf", "zip": "application/zip"}
+DEFAULT_EXPORT_DIR = "exports"
+DEFAULT_SCENARIOS = (
+    {"label": "Baseline", "gdpGrowth": 2.0, "lifeGrowth": 1.0, "urbanGrowth": 1.0},
+    {"label": "Stagnation", "gdpGrowth": 0.0, "lifeGrowth": 0.0, "urbanGrowth": 0.0},
+    {"label": "Fast growth", "gdpGrowth": 5.0, "lifeGrowth": 2.0, "urbanGrowth": 2.0},
+)
+MAX_ACTIVE_JOBS = 2
+JOB_TTL = 3600  # seconds a finished export is kept on disk
+SWEEP_INTERVAL = 300  # seconds between sweeps of the export directory
+EXPORT_FILE = re.compile(r"[0-9a-f]{32}\.(pdf|zip)(\.part)?")  # what ExportManager writes, and all it deletes
+
+
+def scenario_projections(models, populations, birth_rates, death_rates, migration_rates,
+                         scenarios, years_to_project):
+    """Populations of every country under every scenario, shape (countries, scenarios, years + 1)"""
+    n_countries, n_scenarios = len(populations), len(scenarios)
+    # The rate changes depend only on the scenario, so each one is predicted once
+    changes = predict_rate_changes_batch(models, scenarios)
+    projected, _ = project_scenarios(
+        np.repeat(populations, n_scenarios),
+        np.repeat(birth_rates, n_scenarios),
+        np.repeat(death_rates, n_scenarios),
+        np.repeat(migration_rates, n_scenarios),
+        tuple(np.tile(change, n_countries) for change in changes),
+        years_to_project
+    )
+    return projected.T.reshape(n_countries, n_scenarios, years_to_project + 1)
+
+
+# Worker-side drawing.  Each returns (width, height, zlib RGB) for PDF pages or PNG bytes for ZIP entries.
+
+def _canvas_output(figure, canvas, fmt, dpi):
+    if fmt == "zip":
+        buf = io.BytesIO()
+        figure.savefig(buf, format="png", dpi=dpi)
+        return buf.getvalue()
+    figure.set_dpi(dpi)
+    canvas.draw()
+    rgb = np.asarray(canvas.buffer_rgba())[:, :, :3]
+    return rgb.shape[1], rgb.shape[0], zlib.compress(np.ascontiguousarray(rgb).tobytes(), 6)
+
+
+def draw_pyramid_page(country, male, female, fmt, dpi):
+    figure, canvas = pyramid_figure(male, female, f"{country}: Population Pyramid {START_YEAR}")
+    return _canvas_output(figure, canvas, fmt, dpi)
+
+
+def draw_projection_page(country, years, series, labels, fmt, dpi):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 8))
+    canvas = FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    for values, label in zip(series, labels):
+        ax.plot(years, np.asarray(values) / 1e6, label=label, linewidth=2)
+    ax.set_xlabel("Year", fontsize=12, fontweight="bold")
+    ax.set_ylabel("Population (millions)", fontsize=12, fontweight="bold")
+    ax.set_title(f"{country}: Projected Population", fontsize=16, fontweight="bold", pad=20)
+    ax.grid(linestyle="--", alpha=0.7)
+    ax.legend(loc="best")
+    figure.tight_layout()
+    return _canvas_output(figure, canvas, fmt, dpi)
+
+
+class PdfStreamWriter:
+    """Writes a PDF of full-page RGB images, each page as soon as it is added.
+
+    Pages may be added in any order; the page tree written by close() lists
+    them by index.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.pages = {}  # page index -> page object number
+        self._next_object = 3  # 1 is the catalog, 2 the page tree
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write_object(self, number, body, stream=None):
+        self.offsets[number] = self.f.tell()
+        self.f.write(f"{number} 0 obj\n".encode() + body)
+        if stream is not None:
+            self.f.write(b"\nstream\n" + stream + b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def add_page(self, index, width, height, data, dpi):
+        image, content, page = range(self._next_object, self._next_object + 3)
+        self._next_object += 3
+        page_width, page_height = width * 72 / dpi, height * 72 / dpi
+
+        self._write_object(image, (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} /ColorSpace /DeviceRGB "
+            f"/BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>"
+        ).encode(), data)
+        drawing = f"q {page_width:.3f} 0 0 {page_height:.3f} 0 0 cm /Im0 Do Q".encode()
+        self._write_object(content, f"<< /Length {len(drawing)} >>".encode(), drawing)
+        self._write_object(page, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_width:.3f} {page_height:.3f}] "
+            f"/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R >>"
+        ).encode())
+        self.pages[index] = page
+
+    def close(self):
+        kids = " ".join(f"{self.pages[index]} 0 R" for index in sorted(self.pages))
+        self._write_object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>".encode())
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref = self.f.tell()
+        count = self._next_object
+        self.f.write(f"xref\n0 {count}\n0000000000 65535 f \n".encode())
+        for number in range(1, count):
+            self.f.write(f"{self.offsets[number]:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+
+class ExportJob:
+    def __init__(self, fmt, path, pages_total):
+        self.id = uuid.uuid4().hex
+        self.format = fmt
+        self.path = path
+        self.state = "queued"
+        self.pages_total = pages_total
+        self.pages_done = 0
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def status(self):
+        elapsed = None
+        if self.started is not None:
+            elapsed = round((self.finished or time.time()) - self.started, 3)
+        return {
+            "id": self.id,
+            "state": self.state,
+            "format": self.format,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "progress": round(self.pages_done / self.pages_total, 4) if self.pages_total else 1.0,
+            "elapsed_s": elapsed,
+            "error": self.error,
+        }
+
+
+class ExportManager:
+    """Runs export jobs on a process pool and keeps their status"""
+
+    def __init__(self, directory=DEFAULT_EXPORT_DIR, processes=None, max_active=MAX_ACTIVE_JOBS):
+        self.directory = directory
+        self.processes = processes or os.cpu_count() or 1
+        self.max_active = max_active
+        self.jobs = {}
+        self._executor = None
+        self._sweeper = None
+        self._lock = threading.Lock()
+        self.sweep()
+
+    @classmethod
+    def from_env(cls):
+        """A manager writing to EXPORT_DIR with EXPORT_PROCESSES workers (default: one per core)"""
+        processes = int(os.environ.get("EXPORT_PROCESSES", "0") or 0)
+        return cls(os.environ.get("EXPORT_DIR", DEFAULT_EXPORT_DIR), processes or None)
+
+    def _pool(self):
+        # Started on the first export; spawn, since forking a threaded server is not safe
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+                )
+                atexit.register(self.shutdown)
+            return self._executor
+
+    def submit(self, countries, male_pyramids, female_pyramids, years, projections, labels,
+               fmt="pdf", dpi=DEFAULT_DPI):
+        """Starts an export job and returns it, or None when max_active jobs are already running.
+
+        projections is a (countries, scenarios, years) array from scenario_projections.
+        """
+        self.sweep()
+        self._start_sweeper()
+        with self._lock:
+            if sum(job.state in ("queued", "running") for job in self.jobs.values()) >= self.max_active:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            job = ExportJob(fmt, None, 2 * len(countries))
+            job.path = os.path.join(self.directory, f"{job.id}.{fmt}")
+            self.jobs[job.id] = job
+
+        # Page 2i is country i's pyramid, page 2i + 1 its projection
+        pages = []
+        for i, country in enumerate(countries):
+            pages.append((2 * i, draw_pyramid_page, (country, male_pyramids[i], female_pyramids[i], fmt, dpi)))
+            pages.append((2 * i + 1, draw_projection_page, (country, years, projections[i], labels, fmt, dpi)))
+        series = (countries, years, projections, labels)
+        threading.Thread(
+            target=self._run, args=(job, pages, series, dpi), name=f"export-{job.id[:8]}", daemon=True
+        ).start()
+        return job
+
+    def _run(self, job, pages, series, dpi):
+        job.state = "running"
+        job.started = time.time()
+        partial = job.path + ".part"
+        futures = {}
+        try:
+            executor = self._pool()
+            futures = {executor.submit(fn, *args): index for index, fn, args in pages}
+            with open(partial, "wb") as f:
+                if job.format == "pdf":
+                    writer = PdfStreamWriter(f)
+                    for future in as_completed(futures):
+                        width, height, data = future.result()
+                        writer.add_page(futures.pop(future), width, height, data, dpi)
+                        job.pages_done += 1
+                    writer.close()
+                else:
+                    with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive:
+                        _write_series(archive, *series)
+                        for future in as_completed(futures):
+                            index = futures.pop(future)
+                            country = series[0][index // 2]
+                            name = "pyramid" if index % 2 == 0 else "projection"
+                            # PNGs are already compressed
+                            archive.writestr(f"{_safe_name(country)}/{name}.png", future.result(),
+                                             compress_type=zipfile.ZIP_STORED)
+                            job.pages_done += 1
+            os.replace(partial, job.path)
+            job.state = "done"
+        except Exception as e:
+            logger.error(f"Export {job.id} failed: {e}")
+            job.state = "failed"
+            job.error = str(e)
+            for future in futures:
+                future.cancel()
+            if os.path.exists(partial):
+                os.remove(partial)
+        finally:
+            job.finished = time.time()
+
+    def sweep(self):
+        """Forgets jobs finished more than JOB_TTL ago and deletes export files not written to for as long"""
+        cutoff = time.time() - JOB_TTL
+        with self._lock:
+            for job_id, job in list(self.jobs.items()):
+                if job.finished is not None and job.finished < cutoff:
+                    del self.jobs[job_id]
+            active = {job.id for job in self.jobs.values() if job.finished is None}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            if not EXPORT_FILE.fullmatch(entry.name) or entry.name[:32] in active:
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass  # removed by another worker process sharing the directory
+
+    def _start_sweeper(self):
+        with self._lock:
+            if self._sweeper is None:
+                self._sweeper = threading.Thread(target=self._sweep_periodically, name="export-sweeper", daemon=True)
+                self._sweeper.start()
+
+    def _sweep_periodically(self):
+        while True:
+            time.sleep(SWEEP_INTERVAL)
+            try:
+                self.sweep()
+            except OSError as e:
+                logger.warning(f"Export directory sweep failed: {e}")
+
+    def get(self, job_id):
+        self.sweep()
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() or c in " -_" else "_" for c in str(name)).strip() or "country"
+
+
+def _write_series(archive, countries, years, projections, labels):
+    """One CSV per country: a row per year, a column per scenario"""
+    for country, series in zip(countries, projections):
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["year", *labels])
+        for year, values in zip(years, series.T):
+            writer.writerow([year, *values.tolist()])
+        archive.writestr(f"{_safe_name(country)}/projection.csv", out.getvalue())
@@ -0,0 +1,154 @@
+"""Cache of whole response bodies for the expensive routes.
+
+Keys are a hash of the route, the request payload in a normalized form
+(sorted keys, every number as a float, so {"gdpGrowth": 2} and
+{"gdpGrowth": 2.0} share an entry) and a version string.  Projection routes
+pass the registry's model version (a content hash of the loaded model files)
+together with the country data version (a hash of the demographic sources),
+so entries made before a retrain or a data update are never served after
+it; chart routes pass the chart style and matplotlib version.
+
+Two layers: a bounded in-process LRU, and optionally a SQLite file shared by
+every worker process on the host (RESPONSE_CACHE_PATH).  A disk hit is
+copied into the LRU.  SQLite errors are logged and treated as misses; the
+cache never fails a request.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 512
+DEFAULT_DISK_MAXSIZE = 10000
+PRUNE_EVERY = 100  # disk writes between trims of the SQLite table to disk_maxsize
+
+
+def normalize_payload(value):
+    """The payload with dict keys sorted and ints as floats, for stable keys"""
+    if isinstance(value, dict):
+        return {str(key): normalize_payload(value[key]) for key in sorted(value, key=str)}
+    if isinstance(value, (list, tuple)):
+        return [normalize_payload(item) for item in value]
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    return str(value)
+
+
+def cache_key(route, payload, version=""):
+    body = json.dumps([route, version, normalize_payload(payload)], separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU of response bodies, optionally backed by a shared SQLite file"""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, path=None, disk_maxsize=DEFAULT_DISK_MAXSIZE):
+        self.maxsize = maxsize
+        self.path = path
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # one SQLite connection per thread
+        self._disk_writes = 0
+
+    @classmethod
+    def from_env(cls):
+        """A cache sized by RESPONSE_CACHE_SIZE, shared through RESPONSE_CACHE_PATH if set"""
+        return cls(
+            maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", str(DEFAULT_MAXSIZE))),
+            path=os.environ.get("RESPONSE_CACHE_PATH") or None,
+        )
+
+    def _db(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body BLOB NOT NULL, stored REAL NOT NULL)"
+            )
+            self._local.db = db
+        return db
+
+    def get(self, key):
+        """The cached body for key, or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        body = None
+        if self.path is not None:
+            try:
+                row = self._db().execute("SELECT body FROM responses WHERE key = ?", (key,)).fetchone()
+                body = None if row is None else bytes(row[0])
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache read failed: {e}")
+
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._remember(key, body)
+        return body
+
+    def put(self, key, body):
+        with self._lock:
+            self._remember(key, body)
+        if self.path is not None:
+            try:
+                db = self._db()
+                db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, body, time.time()))
+                with self._lock:
+                    self._disk_writes += 1
+                    prune = self._disk_writes % PRUNE_EVERY == 0
+                if prune:
+                    db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY stored DESC LIMIT -1 OFFSET ?)",
+                        (self.disk_maxsize,)
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Response cache write failed: {e}")
+
+    def _remember(self, key, body):
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Empties the in-process layer; the shared file is left to the other processes"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "bytes": sum(len(body) for body in self._entries.values()),
+                "shared_path": self.path,
+            }
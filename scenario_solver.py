@@ -0,0 +1,137 @@
+"""Goal seeking: the growth scenarios whose projection best meets a target.
+
+The inverse of /project_population.  Candidates are scored a whole
+population at a time: one batched inference over every (gdp, life, urban)
+candidate, then the vectorized year recurrence of
+projection_engine.iter_scenarios over all of them, keeping only the
+running statistic the target needs.  The search starts from a regular
+grid over the bounds.  Each refinement round then puts a finer grid (half
+the previous step) around the best few candidates so far.
+
+The forests are piecewise constant in their inputs, so this is a
+search over a step function, not a gradient method.  Each refinement only
+narrows in on regions the coarser grid already found.
+"""
+import numpy as np
+
+from projection_engine import (
+    START_YEAR, build_scenario_grid, iter_scenarios, predict_rate_changes_batch, project_scenarios
+)
+from rate_surface import GDP_RANGE, LIFE_RANGE, URBAN_RANGE
+
+TARGET_TYPES = ("final", "peak", "year")
+GOALS = ("equal", "at_least", "at_most")
+DEFAULT_BOUNDS = (GDP_RANGE, LIFE_RANGE, URBAN_RANGE)
+
+DEFAULT_RESOLUTION = 12  # grid points per axis in the first pass
+REFINE_RESOLUTION = 5  # grid points per axis around each seed in a refinement round
+DEFAULT_REFINEMENTS = 2
+REFINE_SEEDS = 4  # best candidates refined around per round
+DEDUPE_DECIMALS = 9  # grid points closer than this are the same scenario
+
+
+def target_values(population, birth_rate, death_rate, migration_rate, rate_changes,
+                  years_to_project, target_type, target_index=None):
+    """The targeted statistic of every candidate's rounded trajectory, as a float array"""
+    steps = iter_scenarios(population, birth_rate, death_rate, migration_rate, rate_changes, years_to_project)
+    values = None
+    for year, (current_population, _) in enumerate(steps):
+        # Rounded like project_scenarios, so values match the reported trajectories
+        rounded = np.rint(current_population)
+        if target_type == "peak":
+            values = rounded if values is None else np.maximum(values, rounded)
+        elif target_type == "year" and year == target_index:
+            values = rounded
+        elif target_type == "final":
+            values = rounded
+    return values
+
+
+def rank(values, target, goal):
+    """Candidate order: scenarios meeting the goal first, then by relative distance to the target"""
+    error = np.abs(values - target) / target
+    if goal == "at_least":
+        satisfied = values >= target
+    elif goal == "at_most":
+        satisfied = values <= target
+    else:
+        satisfied = np.ones(len(values), dtype=bool)
+    return np.lexsort((error, ~satisfied)), error, satisfied
+
+
+def refine_grid(centers, steps, bounds):
+    """A REFINE_RESOLUTION^3 grid spanning +/- one step around each center, clipped to the bounds"""
+    offsets = np.linspace(-1, 1, REFINE_RESOLUTION)
+    grids = []
+    for center in centers:
+        axes = [
+            np.unique(np.clip(value + offsets * step, low, high))
+            for value, step, (low, high) in zip(center, steps, bounds)
+        ]
+        grids.append(build_scenario_grid(*axes))
+    grid = np.vstack(grids)
+    _, unique_index = np.unique(np.round(grid, DEDUPE_DECIMALS), axis=0, return_index=True)
+    return grid[np.sort(unique_index)]
+
+
+def solve_scenario(models, population, birth_rate, death_rate, migration_rate, years_to_project,
+                   target_type, target, goal="equal", target_year=None, bounds=DEFAULT_BOUNDS,
+                   resolution=DEFAULT_RESOLUTION, refinements=DEFAULT_REFINEMENTS, top=5):
+    """Searches the growth bounds for the scenarios whose projection best meets the target.
+
+    Returns a dict with the best `top` scenarios (growth inputs, targeted
+    value, relative error, whether the goal is met and the full trajectory)
+    and the number of candidates evaluated.
+    """
+    target_index = None if target_year is None else target_year - START_YEAR
+    bounds = [tuple(map(float, axis)) for axis in bounds]
+    axes = [np.linspace(low, high, resolution) for low, high in bounds]
+    steps = np.array([(high - low) / max(resolution - 1, 1) for low, high in bounds])
+
+    scored = []  # (scenarios, values) of every round
+    candidates = build_scenario_grid(*axes)
+    for round_index in range(refinements + 1):
+        rate_changes = predict_rate_changes_batch(models, candidates)
+        values = target_values(population, birth_rate, death_rate, migration_rate, rate_changes,
+                               years_to_project, target_type, target_index)
+        scored.append((candidates, values))
+
+        if round_index == refinements:
+            break
+        scenarios = np.vstack([s for s, _ in scored])
+        order, _, _ = rank(np.concatenate([v for _, v in scored]), target, goal)
+        candidates = refine_grid(scenarios[order[:REFINE_SEEDS]], steps, bounds)
+        steps = steps / 2
+
+    scenarios = np.vstack([s for s, _ in scored])
+    values = np.concatenate([v for _, v in scored])
+    evaluated = len(values)
+    # The refinement grids overlap; keep one row per distinct scenario
+    _, unique_index = np.unique(np.round(scenarios, DEDUPE_DECIMALS), axis=0, return_index=True)
+    scenarios, values = scenarios[unique_index], values[unique_index]
+    order, error, satisfied = rank(values, target, goal)
+    best = order[:top]
+
+    # Only the winners are projected in full
+    chosen = scenarios[best]
+    populations, final_rates = project_scenarios(
+        population, birth_rate, death_rate, migration_rate,
+        predict_rate_changes_batch(models, chosen), years_to_project
+    )
+    solutions = [
+        {
+            "gdpGrowth": float(gdp),
+            "lifeGrowth": float(life),
+            "urbanGrowth": float(urban),
+            "value": int(values[index]),
+            "error": float(error[index]),
+            "satisfied": bool(satisfied[index]),
+            "population": populations[:, column].tolist(),
+            "final_rates": {
+                name: round(float(rate[column]) * 1000, 3)
+                for name, rate in zip(("birth", "death", "migration"), final_rates)
+            },
+        }
+        for column, (index, (gdp, life, urban)) in enumerate(zip(best, chosen))
+    ]
+    return {"solutions": solutions, "evaluated": evaluated}
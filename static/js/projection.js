@@ -355,7 +355,8 @@ function generateProjectionChart() {
   
   const yearsToProject = parseInt(document.getElementById("yearsToProject").value);
 
-  fetch("/project_population", {
+  // Years arrive one line at a time and are drawn as they come in
+  fetch("/project_population/stream", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify({
@@ -369,13 +370,31 @@ function generateProjectionChart() {
       yearsToProject: yearsToProject
     })
   })
-  .then(res => res.json())
-  .then(data => {
-    if (data.error) {
-      alert("Projection error: " + data.error);
-      return;
+  .then(res => {
+    if (!res.ok) {
+      return res.json().then(data => alert("Projection error: " + data.error));
     }
-    plotProjectionChart(data.years, data.population, data.metadata);
+
+    const years = [];
+    const population = [];
+    let metadata = null;
+
+    return readNdjson(res, event => {
+      if (event.type === "meta") {
+        metadata = { growth_rates: event.growth_rates, final_rates: null };
+        plotProjectionChart(years, population, metadata);
+      } else if (event.type === "year") {
+        years.push(event.year);
+        population.push(event.population);
+        scheduleProjectionRedraw();
+      } else if (event.type === "done") {
+        metadata.final_rates = event.final_rates;
+        projectionChart.options.plugins.subtitle.text = projectionSubtitle(metadata);
+        projectionChart.update();
+      } else if (event.type === "error") {
+        alert("Projection error: " + event.error);
+      }
+    });
   })
   .catch(err => {
     console.error("Fetch error:", err);
@@ -383,6 +402,38 @@ function generateProjectionChart() {
   });
 }
 
+// Reads a newline-delimited JSON response, calling onEvent for each line as it arrives
+async function readNdjson(response, onEvent) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffered += decoder.decode(value, { stream: true });
+    const lines = buffered.split('\n');
+    buffered = lines.pop(); // keep a partial last line for the next chunk
+    lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+  }
+  buffered += decoder.decode();
+  if (buffered.trim()) onEvent(JSON.parse(buffered));
+}
+
+// Redraws at most once per animation frame however fast the years arrive
+let projectionRedraw = null;
+function scheduleProjectionRedraw() {
+  if (projectionRedraw) return;
+  projectionRedraw = requestAnimationFrame(() => {
+    projectionRedraw = null;
+    if (projectionChart) projectionChart.update('none');
+  });
+}
+
+function projectionSubtitle(metadata) {
+  if (!metadata.final_rates) return 'Projecting...';
+  return `Final Rates: Birth ${metadata.final_rates.birth}‰, Death ${metadata.final_rates.death}‰, Migration ${metadata.final_rates.migration}‰`;
+}
+
 function plotProjectionChart(years, population, metadata) {
   if (projectionChart) projectionChart.destroy();
 
@@ -415,7 +466,7 @@ function plotProjectionChart(years, population, metadata) {
         },
         subtitle: {
           display: true,
-          text: `Final Rates: Birth ${metadata.final_rates.birth}‰, Death ${metadata.final_rates.death}‰, Migration ${metadata.final_rates.migration}‰`,
+          text: projectionSubtitle(metadata),
           font: { size: 12 },
           color: '#666'
         }
@@ -0,0 +1,167 @@
+"""Incremental projection responses as NDJSON or Server-Sent Events.
+
+The generators here produce one small event dict per projected year, or per
+scenario for sweeps, straight from projection_engine.iter_scenarios and
+cohort_engine.iter_cohorts.  Only the current year (or the current chunk of
+scenarios) is ever held in memory, so a long horizon or a large sweep costs
+time but not memory, and the first rows reach the client immediately.
+
+Every stream starts with a "meta" event and ends with a "done" event; a
+failure after the response has started is reported as an "error" event.
+"""
+import json
+import logging
+
+import numpy as np
+
+from cohort_engine import FEMALE, MALE, initial_cohorts, iter_cohorts, pyramid_percentages
+from projection_engine import (
+    iter_scenarios, predict_rate_changes_batch, project_scenarios, summarize_projections
+)
+from uncertainty import sample_rate_changes
+
+logger = logging.getLogger(__name__)
+
+STREAM_FORMATS = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+# Scenarios x years of a sweep projected at once before their rows are sent
+STREAM_CHUNK_CELLS = 1_000_000
+
+
+def stream_format(requested, accept=""):
+    """Picks "ndjson" or "sse" from an explicit request or the Accept header"""
+    if requested:
+        requested = str(requested).lower()
+        if requested not in STREAM_FORMATS:
+            raise ValueError(f"Unsupported stream format '{requested}'")
+        return requested
+    return "sse" if "text/event-stream" in (accept or "") else "ndjson"
+
+
+def encode_event(event, fmt="ndjson"):
+    body = json.dumps(event, separators=(",", ":"))
+    if fmt == "sse":
+        return f"event: {event['type']}\ndata: {body}\n\n"
+    return body + "\n"
+
+
+def encode_stream(events, fmt="ndjson", on_complete=None):
+    """Encodes an event generator, turning a mid-stream failure into an error event.
+
+    on_complete, if given, is called with the whole body once every event
+    has been sent without error (used to cache finished streams).
+    """
+    sent = [] if on_complete is not None else None
+    try:
+        for event in events:
+            chunk = encode_event(event, fmt)
+            if sent is not None:
+                sent.append(chunk)
+            yield chunk
+    except Exception as e:
+        logger.error(f"Error while streaming projection: {e}")
+        yield encode_event({"type": "error", "error": "Projection stream failed"}, fmt)
+        return
+    if on_complete is not None:
+        on_complete("".join(sent).encode())
+
+
+def _rates_per_1000(rates, index=0):
+    return {
+        name: round(float(rate[index]) * 1000, 3)
+        for name, rate in zip(("birth", "death", "migration"), rates)
+    }
+
+
+def projection_events(population, birth_rate, death_rate, migration_rate, rate_changes,
+                      years_to_project, start_year, metadata, pyramid=None, samples=None):
+    """Year-by-year events for one scenario.
+
+    pyramid adds the cohort-component pyramid of every year; samples is an
+    optional (tree_changes, n_samples, seed, sampling, percentiles) tuple that
+    adds Monte Carlo percentile bands.
+    """
+    yield {"type": "meta", "start_year": start_year, "years": years_to_project + 1, **metadata}
+
+    if rate_changes is not None:
+        rate_changes = tuple(np.atleast_1d(change) for change in rate_changes)
+    steps = iter_scenarios(population, birth_rate, death_rate, migration_rate, rate_changes, years_to_project)
+
+    if pyramid is not None:
+        steps = _cohort_steps(population, pyramid, steps)
+
+    bands = None
+    if samples is not None:
+        tree_changes, n_samples, seed, sampling, percentiles = samples
+        sampled = sample_rate_changes(tree_changes, n_samples, np.random.default_rng(seed), sampling)
+        bands = iter_scenarios(population, birth_rate, death_rate, migration_rate, sampled, years_to_project)
+
+    for year, (current, rates) in enumerate(steps):
+        event = {"type": "year", "year": start_year + year}
+        if pyramid is not None:
+            percentages = np.round(pyramid_percentages(current[0]), 3)
+            event["population"] = int(np.rint(current[0].sum()))
+            event["pyramid"] = {"male": percentages[MALE].tolist(), "female": percentages[FEMALE].tolist()}
+        else:
+            # The starting value is reported as given, like /project_population does
+            event["population"] = population if year == 0 else int(np.rint(current[0]))
+        if bands is not None:
+            sampled_population, _ = next(bands)
+            values = np.rint(np.percentile(np.rint(sampled_population), percentiles))
+            event["bands"] = {f"p{p:g}": int(v) for p, v in zip(percentiles, values)}
+        event["rates"] = _rates_per_1000(rates)
+        yield event
+
+    yield {"type": "done", "final_rates": _rates_per_1000(rates)}
+
+
+def _cohort_steps(population, pyramid, steps):
+    """Turns (population, rates) steps into (cohorts, rates) steps of the cohort engine"""
+    _, rates = next(steps)
+    cohorts = initial_cohorts(population, *pyramid)
+    yield cohorts, rates
+
+    pending = []
+
+    def rate_stream():
+        for _, year_rates in steps:
+            pending.append(year_rates)
+            yield year_rates
+
+    for cohorts in iter_cohorts(cohorts, rate_stream()):
+        yield cohorts, pending.pop()
+
+
+def batch_events(models, population, birth_rate, death_rate, migration_rate, years_to_project,
+                 start_year, n_scenarios, scenario_rows, summary_only=False):
+    """One event per scenario for a sweep, projected in bounded chunks.
+
+    scenario_rows(start, stop) returns those rows of the N x 3 scenario
+    matrix, so a grid never has to be materialized in full.
+    """
+    yield {"type": "meta", "start_year": start_year, "years": years_to_project + 1, "scenarios": n_scenarios}
+
+    chunk = max(1, STREAM_CHUNK_CELLS // (years_to_project + 1))
+    for start in range(0, n_scenarios, chunk):
+        stop = min(start + chunk, n_scenarios)
+        scenarios = scenario_rows(start, stop)
+        rate_changes = predict_rate_changes_batch(models, scenarios)
+        populations, final_rates = project_scenarios(
+            population, birth_rate, death_rate, migration_rate, rate_changes, years_to_project
+        )
+        summary = summarize_projections(populations, start_year)
+        for i in range(stop - start):
+            event = {
+                "type": "scenario",
+                "index": start + i,
+                "gdp": float(scenarios[i, 0]),
+                "life": float(scenarios[i, 1]),
+                "urban": float(scenarios[i, 2]),
+                "final_rates": _rates_per_1000(final_rates, i),
+                "summary": {key: int(values[i]) for key, values in summary.items()},
+            }
+            if not summary_only:
+                event["population"] = populations[:, i].tolist()
+            yield event
+
+    yield {"type": "done", "scenarios": n_scenarios}
@@ -1,51 +1,165 @@
+"""Trains the birth, death and migration rate-change forests.
+
+    python train_model.py                  # full retrain
+    python train_model.py --add-trees 25   # grow the saved forests with trees fitted on the current CSV
+
+The rows come from the memory-mapped data artifact (see data_artifact.py)
+when it is current, and the prepared feature matrix is cached under
+.training_cache/ keyed by the SHA-256 of the CSV, so retraining on
+unchanged data skips the pandas work.
+The three targets are fitted concurrently; each forest keeps
+random_state=42, so a full retrain produces the same trees as fitting them
+one after another.  --add-trees keeps every existing tree and only fits the
+new ones (sklearn's warm_start), which is how new years or countries are
+folded in without refitting from scratch.
+
+Timings and model sizes are printed and written to training_metrics.json.
+"""
+import argparse
+import json
+import os
+import time
+
+import joblib
+import numpy as np
 import pandas as pd
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestRegressor
-import joblib
 
-# Load dataset
-df = pd.read_csv('demographics_multi_year.csv')
-
-# Compute year-over-year percentage changes by country
-df_pct = df.groupby('Country', group_keys=False).apply(
-    lambda group: group.assign(
-        GDP_per_capita=group['GDP_per_capita'].pct_change() * 100,
-        Life_expectancy=group['Life_expectancy'].pct_change() * 100,
-        Urbanization=group['Urbanization'].pct_change() * 100,
-        Birth_rate=group['Birth_rate'].pct_change() * 100,
-        Death_rate=group['Death_rate'].pct_change() * 100,
-        Migration_rate=group['Migration_rate'].pct_change() * 100
-    )
-)
+from compiled_forest import MODEL_NAMES, export_forest
+from data_artifact import HISTORY_PATH, file_hash, training_frame
+
+DATA_PATH = HISTORY_PATH
+CACHE_DIR = '.training_cache'
+METRICS_PATH = 'training_metrics.json'
+
+# Input features (no regions) and one target per model, in MODEL_NAMES order
+FEATURES = ['GDP_per_capita', 'Life_expectancy', 'Urbanization']
+TARGETS = ['Birth_rate', 'Death_rate', 'Migration_rate']
+
+N_ESTIMATORS = 100
+RANDOM_STATE = 42
+PREPARE_VERSION = 1  # bump when prepare_features changes, to invalidate cached matrices
+
+
+def prepare_features(df):
+    """Year-over-year percentage changes per country, as (X, y) with one y column per target"""
+    columns = FEATURES + TARGETS
+    # Country order, then file order within a country: the row order the models were first trained on
+    df = df.sort_values('Country', kind='stable')
+    df_pct = df.groupby('Country')[columns].pct_change() * 100
+
+    # Drop rows with NaN from pct_change, then rows whose targets are infinite
+    df_pct = df_pct.dropna().replace([np.inf, -np.inf], np.nan)
+    df_pct = df_pct.dropna(subset=TARGETS)
+    return df_pct[FEATURES].to_numpy(dtype=np.float64), df_pct[TARGETS].to_numpy(dtype=np.float64)
+
 
-# Drop rows with NaN from pct_change
-df_pct = df_pct.dropna()
+def load_features(cache_dir=CACHE_DIR):
+    """(X, y, data hash, cache hit) for the training CSV"""
+    data_hash = file_hash(DATA_PATH)
+    cache_path = os.path.join(cache_dir, f"features-v{PREPARE_VERSION}-{data_hash[:16]}.npz")
+    if os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return cached['X'], cached['y'], data_hash, True
 
-# Clean infinite and missing values
-df_pct.replace([float('inf'), -float('inf')], pd.NA, inplace=True)
-df_pct.dropna(subset=['Birth_rate', 'Death_rate', 'Migration_rate'], inplace=True)
+    # Read from the memory-mapped data artifact unless it is older than the CSV
+    X, y = prepare_features(training_frame())
+    os.makedirs(cache_dir, exist_ok=True)
+    np.savez(cache_path, X=X, y=y)
+    return X, y, data_hash, False
 
-# Define input features (no regions)
-features = ['GDP_per_capita', 'Life_expectancy', 'Urbanization']
-X = df_pct[features]
 
-# Define targets
-y_birth = df_pct['Birth_rate']
-y_death = df_pct['Death_rate']
-y_migration = df_pct['Migration_rate']
+def fit_target(model, X, y):
+    start = time.perf_counter()
+    # Fitted on a DataFrame so the models carry feature_names_in_ for the app's feature schema
+    model.fit(pd.DataFrame(X, columns=FEATURES), y)
+    return model, time.perf_counter() - start
+
+
+def new_models(jobs_per_model):
+    return [
+        RandomForestRegressor(n_estimators=N_ESTIMATORS, random_state=RANDOM_STATE, n_jobs=jobs_per_model)
+        for _ in MODEL_NAMES
+    ]
+
+
+def grown_models(add_trees, jobs_per_model):
+    """The saved models set up to fit add_trees more trees each"""
+    models = []
+    for name in MODEL_NAMES:
+        model = joblib.load(f'{name}.pkl')
+        if list(getattr(model, 'feature_names_in_', FEATURES)) != FEATURES:
+            raise ValueError(f"{name}.pkl was trained on different features; retrain without --add-trees")
+        model.set_params(warm_start=True, n_estimators=model.n_estimators + add_trees, n_jobs=jobs_per_model)
+        models.append(model)
+    return models
+
+
+def model_size(model, name):
+    forest = export_forest(model, name)
+    return {
+        "trees": len(model.estimators_),
+        "nodes": int(sum(tree.tree_.node_count for tree in model.estimators_)),
+        "pickle_bytes": os.path.getsize(f'{name}.pkl'),
+        "compiled_bytes": int(forest.nbytes),
+    }
+
+
+def train(add_trees=0, jobs=None):
+    jobs = jobs or os.cpu_count() or 1
+    timings = {}
+
+    start = time.perf_counter()
+    X, y, data_hash, cache_hit = load_features()
+    timings["prepare_s"] = time.perf_counter() - start
+
+    # One thread per target; the forests split whatever cores are left between their trees
+    jobs_per_model = max(1, jobs // len(MODEL_NAMES))
+    models = grown_models(add_trees, jobs_per_model) if add_trees else new_models(jobs_per_model)
+
+    start = time.perf_counter()
+    fitted = Parallel(n_jobs=min(jobs, len(models)), prefer='threads')(
+        delayed(fit_target)(model, X, y[:, column]) for column, model in enumerate(models)
+    )
+    timings["fit_s"] = time.perf_counter() - start
+    timings["fit_per_model_s"] = {name: seconds for name, (_, seconds) in zip(MODEL_NAMES, fitted)}
+
+    # Save models, then export flattened array versions for the app's lightweight evaluator
+    start = time.perf_counter()
+    sizes = {}
+    for name, (model, _) in zip(MODEL_NAMES, fitted):
+        model.set_params(warm_start=False, n_jobs=None)
+        joblib.dump(model, f'{name}.pkl')
+        sizes[name] = model_size(model, name)
+    timings["save_s"] = time.perf_counter() - start
 
-# Train models
-birth_model = RandomForestRegressor(n_estimators=100, random_state=42)
-death_model = RandomForestRegressor(n_estimators=100, random_state=42)
-migration_model = RandomForestRegressor(n_estimators=100, random_state=42)
+    return {
+        "data": {"path": DATA_PATH, "sha256": data_hash, "rows": int(X.shape[0]), "cache_hit": cache_hit},
+        "mode": f"add_trees={add_trees}" if add_trees else "full",
+        "jobs": jobs,
+        "timings": timings,
+        "models": sizes,
+    }
 
-birth_model.fit(X, y_birth)
-death_model.fit(X, y_death)
-migration_model.fit(X, y_migration)
 
-# Save models
-joblib.dump(birth_model, 'birth_model.pkl')
-joblib.dump(death_model, 'death_model.pkl')
-joblib.dump(migration_model, 'migration_model.pkl')
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the rate-change forests")
+    parser.add_argument("--add-trees", type=int, default=0,
+                        help="keep the saved forests and fit this many extra trees on the current data")
+    parser.add_argument("--jobs", type=int, help="cores to use (default: all)")
+    parser.add_argument("--metrics", default=METRICS_PATH, help="where to write the training metrics")
+    args = parser.parse_args()
 
-print("Models trained and saved successfully (no regions).")
+    report = train(args.add_trees, args.jobs)
+    with open(args.metrics, 'w') as f:
+        json.dump(report, f, indent=2)
 
+    timings = report["timings"]
+    print(f"Models trained and saved successfully (no regions, {report['mode']}): "
+          f"{report['data']['rows']} rows, prepare {timings['prepare_s'] * 1000:.0f} ms"
+          f"{' (cached)' if report['data']['cache_hit'] else ''}, fit {timings['fit_s']:.2f} s, "
+          f"save {timings['save_s']:.2f} s")
+    for name, size in report["models"].items():
+        print(f"  {name}: {size['trees']} trees, {size['nodes']} nodes, "
+              f"pickle {size['pickle_bytes'] / 1024:.0f} KB, compiled {size['compiled_bytes'] / 1024:.0f} KB")
@@ -0,0 +1,77 @@
+"""Monte Carlo projection bands from the per-tree forest predictions.
+
+Each random forest holds an ensemble of trees whose individual predictions
+spread around the mean the deterministic projection uses.  A probabilistic
+projection draws K (birth, death, migration) rate-change triples from those
+trees, runs every draw through the same clipping and bounds as
+projection_engine.project_scenarios and reports percentile bands.
+
+All K draws go through project_scenarios together, one [years, K] array
+with whole-array operations per year and no loop over samples, so each
+band is built from trajectories that follow exactly the rules of the
+deterministic projection.
+"""
+import numpy as np
+
+from metrics import timed
+from projection_engine import project_scenarios
+
+SAMPLING_METHODS = ("tree", "bootstrap")
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+def tree_predictions(model, X):
+    """Per-tree predictions of one model, shape (n_samples, n_trees)"""
+    # Surface lookups only tabulate the mean, so go to the forest they wrap
+    model = getattr(model, "fallback_model", model)
+    if hasattr(model, "predict_trees"):
+        return model.predict_trees(X)
+    if hasattr(model, "estimators_"):
+        X = np.asarray(X, dtype=float)
+        return np.column_stack([tree.predict(X) for tree in model.estimators_])
+    raise ValueError("Model does not expose per-tree predictions")
+
+
+def tree_rate_changes(models, gdp_growth, life_growth, urban_growth):
+    """Birth, death and migration percent changes predicted by every tree for one scenario"""
+    X = np.array([[gdp_growth, life_growth, urban_growth]])
+    with timed("model_predict_trees"):
+        return tuple(tree_predictions(model, X)[0] for model in models)
+
+
+def sample_rate_changes(tree_changes, n_samples, rng, method="tree"):
+    """Draws n_samples (birth, death, migration) change triples from the per-tree predictions.
+
+    "tree" picks one tree per model and sample, so the spread reflects the
+    disagreement between trees.  "bootstrap" averages a resample of the trees
+    with replacement, which gives the (narrower) uncertainty of the forest
+    mean itself.
+    """
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method '{method}'")
+    samples = []
+    for changes in tree_changes:
+        changes = np.asarray(changes, dtype=float)
+        if method == "tree":
+            samples.append(changes[rng.integers(0, len(changes), n_samples)])
+        else:
+            picks = rng.integers(0, len(changes), (n_samples, len(changes)))
+            samples.append(changes[picks].mean(axis=1))
+    return tuple(samples)
+
+
+def project_samples(population, birth_rate, death_rate, migration_rate,
+                    tree_changes, years_to_project, n_samples, seed, method="tree"):
+    """Projects n_samples sampled scenarios; returns a (years + 1) x n_samples population array"""
+    rng = np.random.default_rng(seed)
+    rate_changes = sample_rate_changes(tree_changes, n_samples, rng, method)
+    populations, _ = project_scenarios(
+        population, birth_rate, death_rate, migration_rate, rate_changes, years_to_project
+    )
+    return populations
+
+
+def projection_bands(populations, percentiles=DEFAULT_PERCENTILES):
+    """Per-year percentiles over the sample axis, as {"p10": array, ...}"""
+    values = np.percentile(populations, percentiles, axis=1)
+    return {f"p{p:g}": np.rint(row).astype(np.int64) for p, row in zip(percentiles, values)}
@@ -0,0 +1,150 @@
+"""Bounded process pool for the CPU-bound parts of a request.
+
+Chart drawing and model evaluation hold the GIL (or compete with the
+server's threads through sklearn's joblib backend), so in the async serving
+mode (see asgi.py) they run in a fixed set of worker processes instead.
+Request threads only wait on a future, which keeps cheap routes such as
+/get-country-data and /health responsive while heavy requests are in
+flight.
+
+Backpressure is applied at admission: a heavy request takes one of
+max_workers + max_queue slots and is turned away with 503 when none are
+free, rather than queueing without bound.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from charts import draw_pyramid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30.0  # seconds a request waits for its job
+
+_worker_registry = None
+
+
+def _init_worker():
+    """Loads the models once per worker process"""
+    global _worker_registry
+    from model_registry import ModelRegistry
+
+    _worker_registry = ModelRegistry.from_env()
+    models = _worker_registry.get_models() or ()
+    # One process per core already; stop sklearn from starting threads of its own
+    for model in models:
+        model = getattr(model, "fallback_model", model)
+        if hasattr(model, "n_jobs"):
+            model.n_jobs = 1
+
+
+def _call_model(index, method, X):
+    from uncertainty import tree_predictions
+
+    model = _worker_registry.get_models()[index]
+    if method == "predict_trees":
+        return tree_predictions(model, X)
+    return model.predict(X)
+
+
+class WorkerPool:
+    """A fixed-size process pool with admission control"""
+
+    def __init__(self, max_workers, max_queue=None, timeout=DEFAULT_TIMEOUT):
+        self.max_workers = max_workers
+        self.max_queue = max_workers * 2 if max_queue is None else max_queue
+        self.timeout = timeout
+        self.admitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_queue)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        atexit.register(self.shutdown)
+
+    def _new_executor(self):
+        # spawn: forking a threaded server process is not safe
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    @classmethod
+    def from_env(cls):
+        """A pool sized by WORKER_POOL_SIZE (and WORKER_POOL_QUEUE), or None when unset or 0"""
+        size = int(os.environ.get("WORKER_POOL_SIZE", "0") or 0)
+        if size <= 0:
+            return None
+        queue = os.environ.get("WORKER_POOL_QUEUE")
+        logger.info(f"Starting worker pool with {size} processes")
+        return cls(size, None if queue is None else int(queue))
+
+    def admit(self):
+        """Takes an admission slot without blocking; False means the caller should answer 503"""
+        if self._slots.acquire(blocking=False):
+            with self._lock:
+                self.admitted += 1
+            return True
+        with self._lock:
+            self.rejected += 1
+        return False
+
+    def release(self):
+        self._slots.release()
+        with self._lock:
+            self.completed += 1
+
+    def run(self, fn, *args):
+        """Runs fn(*args) in a worker process and waits for the result"""
+        executor = self._executor
+        try:
+            return executor.submit(fn, *args).result(timeout=self.timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for later requests
+            with self._lock:
+                if self._executor is executor:
+                    logger.error("Worker pool broken, restarting it")
+                    self._executor = self._new_executor()
+            raise
+
+    def render_chart(self, male, female, fmt, dpi):
+        return self.run(draw_pyramid, male, female, fmt, dpi)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.admitted - self.completed,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+            }
+
+
+class PooledModel:
+    """Model proxy whose predictions run in the worker pool"""
+
+    def __init__(self, pool, index, model):
+        self.pool = pool
+        self.index = index
+        self.n_features_in_ = model.n_features_in_
+        if hasattr(model, "feature_names_in_"):
+            self.feature_names_in_ = model.feature_names_in_
+
+    def predict(self, X):
+        return self.pool.run(_call_model, self.index, "predict", X)
+
+    def predict_trees(self, X):
+        return self.pool.run(_call_model, self.index, "predict_trees", X)
+
+
+def pooled_models(pool, models):
+    return tuple(PooledModel(pool, index, model) for index, model in enumerate(models))